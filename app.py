@@ -1,10 +1,49 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
-import sqlite3, hashlib
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, abort
+import sqlite3, hashlib, os
 from datetime import datetime
+from fragment_cache import FragmentCacheExtension
+import jinja_cache
+import catalog_snapshot
+import rate_limit
+from rate_limit import Limit
+import facets
+import user_context
 
 app = Flask(__name__)
-DATABASE = "kazprice.db"
+# KAZPRICE_DB points the app at another database file (tests use a scratch copy)
+DATABASE = os.environ.get('KAZPRICE_DB', 'kazprice.db')
 app.secret_key = 'secret123'
+# {% cache %} tag for rendered product cards (see fragment_cache.py)
+app.jinja_env.add_extension(FragmentCacheExtension)
+# Compiled templates persisted on disk (scripts/compile_templates.py fills it at build time)
+jinja_cache.init_app(app)
+
+# Per-endpoint token buckets: rate is tokens/second, burst is the bucket size.
+RATE_LIMITS = {
+    'login': Limit(rate=5 / 60, burst=10, methods=('POST',)),
+    'register': Limit(rate=3 / 60, burst=5, methods=('POST',)),
+    'add_to_cart': Limit(rate=2, burst=20),
+    'process_payment': Limit(rate=6 / 60, burst=5),
+}
+# Set KAZPRICE_RATELIMIT_DB to a file path so all gunicorn workers share buckets
+RATE_LIMIT_DB = os.environ.get('KAZPRICE_RATELIMIT_DB')
+# Number of reverse proxies (nginx, load balancer) in front of the app; 0 = use the socket address
+TRUSTED_PROXIES = int(os.environ.get('KAZPRICE_TRUSTED_PROXIES', 0))
+rate_limit.init_app(app, RATE_LIMITS,
+                    store=rate_limit.SQLiteBucketStore(RATE_LIMIT_DB) if RATE_LIMIT_DB else None,
+                    trusted_proxies=TRUSTED_PROXIES)
+
+# Upper bound of products shown for a filtered catalog page
+MAX_FILTER_RESULTS = 500
+
+# mmap'ed catalog shared by all workers, rebuilt by scripts/build_catalog_snapshot.py
+CATALOG_SNAPSHOT = os.environ.get('KAZPRICE_CATALOG_SNAPSHOT', 'catalog.snap')
+catalog_snapshots = catalog_snapshot.SnapshotReader(CATALOG_SNAPSHOT)
+
+# Logged-in user and bank cards: loaded once per request and cached per process
+# for a few seconds (0 disables); see user_context.py
+USER_CONTEXT_TTL = float(os.environ.get('KAZPRICE_USER_CACHE_TTL', 30))
+user_contexts = user_context.UserContextCache(ttl=USER_CONTEXT_TTL)
 
 
 @app.context_processor
@@ -24,6 +63,11 @@ def get_db_connection():
     return conn
 
 
+def current_user_context():
+    """(user, cards) of the logged-in user, or None; at most one query per request."""
+    return user_context.current(user_contexts, get_db_connection)
+
+
 def ensure_user_columns():
     """Ensure `users` table has phone and address columns, and cards table exists.
     Adds them if missing. This runs at app startup to avoid "no such column" errors on older databases.
@@ -78,6 +122,11 @@ def ensure_user_columns():
             ''')
             added = True
 
+        # Cards of one user, newest first (user_context.fetch)
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_bank_cards_user'").fetchone():
+            conn.execute('CREATE INDEX idx_bank_cards_user ON bank_cards (user_id, created_at)')
+            added = True
+
         # Ensure order_history table exists
         try:
             cur = conn.execute('PRAGMA table_info(order_history)')
@@ -111,8 +160,111 @@ def ensure_user_columns():
             pass
 
 
+def ensure_catalog_meta():
+    """Ensure the `catalog_meta` version row and the triggers that bump it exist.
+    Any insert/update/delete on products or prices increments the version, so
+    caches keyed by it (rendered product cards) never serve stale data.
+    """
+    try:
+        conn = get_db_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS catalog_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.execute('INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0)')
+        for table in ('products', 'prices'):
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_catalog_version
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE catalog_meta SET version = version + 1 WHERE id = 1;
+                    END
+                ''')
+        conn.commit()
+        conn.close()
+    except sqlite3.OperationalError:
+        # products/prices not created yet (fresh DB) — db_init.sql creates them with the triggers
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_catalog_version(conn):
+    """Current catalog version (0 if the meta table is missing)."""
+    try:
+        row = conn.execute('SELECT version FROM catalog_meta WHERE id = 1').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row['version'] if row else 0
+
+
+def ensure_job_tables():
+    """Ensure the `jobs` queue table and `order_items` (filled by the order_paid job) exist."""
+    import job_handlers  # only needed while migrating (see ensure_schema)
+    try:
+        conn = get_db_connection()
+        job_handlers.ensure_schema(conn)
+        conn.commit()
+        conn.close()
+    except sqlite3.OperationalError:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def ensure_wal():
+    """Switch the database to WAL so readers, writers and scripts/db_backup.py don't block each other.
+    Skipped when the database directory is read-only (WAL needs the -wal/-shm files next to it).
+    """
+    if not os.access(os.path.dirname(os.path.abspath(DATABASE)), os.W_OK):
+        return
+    conn = get_db_connection()
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+    except sqlite3.OperationalError:
+        pass
+    finally:
+        conn.close()
+
+
+# Bump when an ensure_* function above starts creating something new
+SCHEMA_VERSION = 4
+SCHEMA_TABLES = ('users', 'products', 'prices', 'bank_cards', 'order_history', 'catalog_meta', 'jobs', 'order_items')
+
+
+def ensure_schema():
+    """Run the ensure_* migrations unless `PRAGMA user_version` says they already ran.
+    Keeps cold starts to a single PRAGMA on an up-to-date database.
+    """
+    conn = get_db_connection()
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    conn.close()
+    if version >= SCHEMA_VERSION:
+        return
+
+    ensure_user_columns()
+    ensure_catalog_meta()
+    ensure_job_tables()
+    ensure_wal()
+
+    # Only mark the database as migrated when everything exists (not on a fresh DB)
+    conn = get_db_connection()
+    found = conn.execute('SELECT COUNT(*) FROM sqlite_master WHERE type = ? AND name IN ({})'.format(
+        ','.join('?' * len(SCHEMA_TABLES))), ('table',) + SCHEMA_TABLES).fetchone()[0]
+    if found == len(SCHEMA_TABLES):
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.commit()
+    conn.close()
+
+
 # Ensure schema compatibility on startup
-ensure_user_columns()
+ensure_schema()
+
 
 @app.route('/')
 def index():
@@ -154,12 +306,14 @@ def login():
         pw_hash = hashlib.sha256(password.encode()).hexdigest()
 
         conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE email=? AND password_hash=?', (email, pw_hash)).fetchone()
+        # Loads the cards too, so the pages after login start from a warm cache
+        ctx = user_context.fetch(conn, email=email, password_hash=pw_hash)
         conn.close()
 
-        if user:
-            session['user_id'] = user['id']
-            session['user_name'] = user['name']
+        if ctx:
+            session['user_id'] = ctx.user['id']
+            session['user_name'] = ctx.user['name']
+            user_context.remember(user_contexts, ctx)
             return redirect(url_for('main'))
         else:
             flash('Почта немесе құпия сөз қате!', 'danger')
@@ -171,32 +325,108 @@ def login():
 @app.route('/main')
 def main():
     conn = get_db_connection()
-    # Get product list with a best (minimal) price if prices table exists
-    products = conn.execute('''
-        SELECT p.*, MIN(pr.price) as price
-        FROM products p
-        LEFT JOIN prices pr ON pr.product_id = p.id
-        GROUP BY p.id
-    ''').fetchall()
+    catalog_version = get_catalog_version(conn)
+    # Facet counts come from the in-memory bitset index (rebuilt in the background per catalog version)
+    filters = facets.filters_from_args(request.args)
+    facet_index = facets.get_facet_index(conn, catalog_version, connect=get_db_connection)
+    matched_ids, facet_counts = facet_index.search(filters, limit=MAX_FILTER_RESULTS)
+    if filters:
+        products = _get_products_by_ids(conn, matched_ids)
+    else:
+        snapshot = _fresh_snapshot(conn, catalog_version)
+        if snapshot is not None:
+            products = snapshot.products()
+        else:
+            # Get product list with a best (minimal) price if prices table exists
+            products = conn.execute('''
+                SELECT p.*, MIN(pr.price) as price
+                FROM products p
+                LEFT JOIN prices pr ON pr.product_id = p.id
+                GROUP BY p.id
+            ''').fetchall()
+            # Row → dict түріне айналдыру
+            products = [dict(p) for p in products]
+    store_index = _get_store_price_index(conn)
     conn.close()
-    
-    # Row → dict түріне айналдыру
-    products = [dict(p) for p in products]
+
     # session-backed favorites and cart
     favorites = session.get('favorites', [])
     cart = session.get('cart', {})
 
-    return render_template('main.html', products=products, favorites=favorites, cart=cart)
+    return render_template('main.html', products=products, favorites=favorites, cart=cart,
+                           catalog_version=catalog_version, facet_index=facet_index,
+                           facet_counts=facet_counts, filters=filters, store_index=store_index)
+
+
+def _get_store_price_index(conn):
+    """Store ranking written by scripts/run_price_analytics.py (empty until it has run)."""
+    try:
+        rows = conn.execute('''
+            SELECT s.name, i.price_index, i.cheapest_count, i.outliers
+            FROM store_price_index i
+            JOIN stores s ON s.id = i.store_id
+            WHERE i.price_index IS NOT NULL
+            ORDER BY i.price_index
+        ''').fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [dict(r) for r in rows]
+
+
+def _fresh_snapshot(conn, catalog_version=None):
+    """The mmap'ed catalog snapshot if it matches the current catalog version, else None."""
+    snapshot = catalog_snapshots.current()
+    if snapshot is None:
+        return None
+    if catalog_version is None:
+        catalog_version = get_catalog_version(conn)
+    return snapshot if snapshot.catalog_version == catalog_version else None
 
 
 def _get_products_by_ids(conn, ids):
     if not ids:
         return []
+    snapshot = _fresh_snapshot(conn)
+    if snapshot is not None:
+        return snapshot.products(ids)
     q = 'SELECT p.*, MIN(pr.price) as price FROM products p LEFT JOIN prices pr ON pr.product_id=p.id WHERE p.id IN ({seq}) GROUP BY p.id'.format(seq=','.join(['?']*len(ids)))
     rows = conn.execute(q, ids).fetchall()
     return [dict(r) for r in rows]
 
 
+# --- Тауар беті ---
+@app.route('/product/<int:product_id>')
+def product_page(product_id: int):
+    conn = get_db_connection()
+    product = conn.execute('''
+        SELECT p.*, MIN(pr.price) as price
+        FROM products p
+        LEFT JOIN prices pr ON pr.product_id = p.id
+        WHERE p.id = ?
+        GROUP BY p.id
+    ''', (product_id,)).fetchone()
+    if product is None:
+        conn.close()
+        abort(404)
+    offers = conn.execute('''
+        SELECT s.name AS store_name, pr.price
+        FROM prices pr
+        LEFT JOIN stores s ON s.id = pr.store_id
+        WHERE pr.product_id = ? AND pr.price IS NOT NULL
+        ORDER BY pr.price
+    ''', (product_id,)).fetchall()
+    # Precomputed by scripts/build_similar_products.py; empty until it has run
+    import similar_products  # only the product page uses it (~7 ms of import)
+    try:
+        variants = [dict(r) for r in similar_products.variants(conn, product_id)]
+        alternatives = [dict(r) for r in similar_products.alternatives(conn, product_id)]
+    except sqlite3.OperationalError:
+        variants, alternatives = [], []
+    conn.close()
+    return render_template('product.html', product=dict(product), offers=offers, variants=variants,
+                           alternatives=alternatives, favorites=session.get('favorites', []))
+
+
 @app.route('/favorites')
 def favorites_view():
     favs = session.get('favorites', [])
@@ -384,23 +614,16 @@ def profile():
         flash('Профильді көру үшін алдымен кіріңіз!', 'warning')
         return redirect(url_for('login'))
 
-    conn = get_db_connection()
-    # Select only the fields we need
-    user = conn.execute('SELECT id, name, email, phone, address, created_at FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-
-    # Load bank cards for this user
-    cards = conn.execute('SELECT id, card_name, card_number, balance, created_at FROM bank_cards WHERE user_id = ? ORDER BY created_at DESC', (session['user_id'],)).fetchall()
-    cards = [dict(c) for c in cards] if cards else []
-
-    conn.close()
+    # User and bank cards (newest first) from the per-request / short-TTL cache
+    ctx = current_user_context()
 
     # If the user record does not exist (stale session), clear session and redirect to login
-    if not user:
+    if not ctx:
         session.clear()
         flash('Пайдаланушы табылмады. Қайта кіруіңізді сұраймыз.', 'warning')
         return redirect(url_for('login'))
 
-    return render_template('profile.html', user=user, cards=cards)
+    return render_template('profile.html', user=ctx.user, cards=ctx.cards)
 
 
 @app.route('/add_card', methods=['GET', 'POST'])
@@ -440,6 +663,7 @@ def add_card():
                      (session['user_id'], card_name, masked, balance))
         conn.commit()
         conn.close()
+        user_context.changed(user_contexts, session['user_id'])
 
         flash('Карта сәтті қосылды', 'success')
         return redirect(url_for('profile'))
@@ -456,7 +680,6 @@ def edit_profile():
         return redirect(url_for('login'))
 
     user_id = session['user_id']
-    conn = get_db_connection()
 
     if request.method == 'POST':
         name = request.form.get('name','').strip()
@@ -474,31 +697,34 @@ def edit_profile():
             for e in errors:
                 flash(e, 'error')
             # re-render form with posted values
-            conn.close()
             return render_template('edit_profile.html', user={'id':user_id,'name':name,'email':email,'phone':phone,'address':address})
 
+        conn = get_db_connection()
         try:
             conn.execute('UPDATE users SET name=?, email=?, phone=?, address=? WHERE id=?', (name, email, phone, address, user_id))
             conn.commit()
+            user_context.changed(user_contexts, user_id)
             flash('Профиль сәтті жаңартылды.', 'success')
             return redirect(url_for('profile'))
         except sqlite3.IntegrityError:
             flash('Бұл почта басқа пайдаланушыға тіркелген болуы мүмкін.', 'error')
-            conn.close()
             return render_template('edit_profile.html', user={'id':user_id,'name':name,'email':email,'phone':phone,'address':address})
+        finally:
+            conn.close()
     else:
-        user = conn.execute('SELECT id, name, email, phone, address FROM users WHERE id = ?', (user_id,)).fetchone()
-        conn.close()
-        if not user:
+        ctx = current_user_context()
+        if not ctx:
             session.clear()
             flash('Пайдаланушы табылмады. Қайта кіруіңізді сұраймыз.', 'warning')
             return redirect(url_for('login'))
-        return render_template('edit_profile.html', user=user)
+        return render_template('edit_profile.html', user=ctx.user)
 
 # --- Шығу ---
 @app.route('/logout')
 def logout():
     # Clear the session and redirect to login
+    if 'user_id' in session:
+        user_contexts.invalidate(session['user_id'])
     session.clear()
     flash('Сіз жүйеден шықтыңыз.', 'info')
     return redirect(url_for('login'))
@@ -549,13 +775,12 @@ def checkout():
     ids = [int(k) for k in cart.keys()] if cart else []
     conn = get_db_connection()
     products = _get_products_by_ids(conn, ids) if ids else []
-    
-    # Load user data (always fresh from DB, not cached)
-    user = conn.execute('SELECT id, name, email, phone, address, created_at FROM users WHERE id = ?', 
-                       (session['user_id'],)).fetchone()
-    user_dict = dict(user) if user else {}
     conn.close()
 
+    # User data from the user context (reloaded after every profile/card/payment write)
+    ctx = current_user_context()
+    user_dict = dict(ctx.user) if ctx else {}
+
     # Check if user has address
     if not user_dict.get('address'):
         flash('Профильде мекенжай қосыңыз!', 'warning')
@@ -590,14 +815,12 @@ def payment():
     ids = [int(k) for k in cart.keys()] if cart else []
     conn = get_db_connection()
     products = _get_products_by_ids(conn, ids) if ids else []
-    
-    # Get user's bank cards (masked numbers)
-    cards = conn.execute('SELECT id, card_name, card_number, balance FROM bank_cards WHERE user_id = ? ORDER BY created_at DESC', 
-                         (session['user_id'],)).fetchall()
-    cards = [dict(c) for c in cards] if cards else []
-    
     conn.close()
 
+    # User's bank cards (masked numbers), newest first
+    ctx = current_user_context()
+    cards = ctx.cards if ctx else []
+
     # Calculate total
     cart_total = sum((p.get('price') or 0) * (cart.get(str(p['id']), 0) or 0) for p in products)
     delivery_cost = 1500
@@ -633,32 +856,45 @@ def process_payment():
     delivery_cost = 1500
     total_amount = cart_total + delivery_cost
 
-    # Get the card from bank_cards
-    card = conn.execute('SELECT id, card_name, card_number, balance FROM bank_cards WHERE id = ? AND user_id = ?', 
-                       (int(card_id), session['user_id'])).fetchone()
-    
+    # Ownership, balance check and deduction in one statement; the balance is
+    # never taken from the cached user context
+    card = conn.execute('''
+        UPDATE bank_cards SET balance = balance - ?
+        WHERE id = ? AND user_id = ? AND balance >= ?
+        RETURNING id, card_name, balance
+    ''', (total_amount, int(card_id), session['user_id'], total_amount)).fetchone()
+
     if not card:
+        # Tell "not your card" from "not enough money" from the database, not the cached context
+        owned = conn.execute('SELECT 1 FROM bank_cards WHERE id = ? AND user_id = ?',
+                             (int(card_id), session['user_id'])).fetchone()
         conn.close()
+        if owned:
+            return jsonify({'status': 'error', 'message': 'Қаражатыңыз жеткіліксіз'}), 400
         return jsonify({'status': 'error', 'message': 'Карта табылмады'}), 404
 
-    card_balance = card['balance']
-    
-    # Check if enough balance
-    if card_balance < total_amount:
-        conn.close()
-        return jsonify({'status': 'error', 'message': 'Қаражатыңыз жеткіліксіз'}), 400
-
-    # Deduct from card balance
-    new_balance = card_balance - total_amount
-    conn.execute('UPDATE bank_cards SET balance = ? WHERE id = ?', (new_balance, card['id']))
+    new_balance = card['balance']
 
-    # Record order history
+    # Record order history; follow-up work goes to the job queue in the same transaction.
+    # A savepoint keeps the order row and its job together if either fails.
+    import jobs  # only payments enqueue jobs
+    conn.execute('SAVEPOINT record_order')
     try:
-        conn.execute('INSERT INTO order_history (user_id, total_amount, card_id, card_name) VALUES (?, ?, ?, ?)',
-                     (session['user_id'], total_amount, card['id'], card['card_name']))
-    except Exception:
-        # If order_history doesn't exist or insert fails, ignore to avoid blocking payment
-        pass
+        cur = conn.execute('INSERT INTO order_history (user_id, total_amount, card_id, card_name) VALUES (?, ?, ?, ?)',
+                           (session['user_id'], total_amount, card['id'], card['card_name']))
+        jobs.enqueue(conn, 'order_paid', {
+            'order_id': cur.lastrowid,
+            'user_id': session['user_id'],
+            'total_amount': total_amount,
+            'items': [{'product_id': p['id'], 'quantity': cart.get(str(p['id']), 0), 'price': p.get('price')}
+                      for p in products],
+        })
+    except sqlite3.Error:
+        # The card is already charged: keep the payment, but leave a trace of the missing order
+        conn.execute('ROLLBACK TO record_order')
+        app.logger.exception('Payment of %s by user %s: order_history/order_paid job not recorded',
+                             total_amount, session['user_id'])
+    conn.execute('RELEASE record_order')
     
     # Clear session cart
     session['cart'] = {}
@@ -666,6 +902,8 @@ def process_payment():
     
     conn.commit()
     conn.close()
+    # Card balance changed
+    user_context.changed(user_contexts, session['user_id'])
 
     return jsonify({
         'status': 'success', 
@@ -0,0 +1,189 @@
+"""
+ASGI serving mode for the KazPrice Flask app.
+
+    pip install -r requirements-scripts.txt   # uvicorn
+    uvicorn asgi:asgi_app --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 asgi:asgi_app
+
+The event loop only parses HTTP and shuffles bytes. Each request is handed
+to the Flask app on a thread pool, so a slow SQLite call or a
+long streamed response never blocks the loop:
+
+- reads go to a bounded reader pool (ASGI_READ_THREADS threads);
+- requests to endpoints that write the database (WRITE_ENDPOINTS) all go to
+  one writer thread, so writes from this process are serialized and never
+  fight each other for the SQLite write lock (no SQLITE_BUSY in-process).
+
+When the pools are saturated requests wait in the executor queue instead of
+each tying up a whole sync worker. vercel.json still serves app.py as WSGI.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import sys
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+
+from app import app
+
+ASGI_READ_THREADS = int(os.environ.get('KAZPRICE_ASGI_READ_THREADS', '8'))
+
+# (endpoint, method) pairs whose handlers write to the database
+WRITE_ENDPOINTS = {
+    ('register', 'POST'),
+    ('add_card', 'POST'),
+    ('edit_profile', 'POST'),
+    ('process_payment', 'POST'),
+}
+
+
+class DBExecutors:
+    """Bounded reader pool plus a single writer thread."""
+
+    def __init__(self, read_threads=ASGI_READ_THREADS):
+        self.readers = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix='kazprice-read')
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kazprice-write')
+
+    def for_request(self, app, environ):
+        """Pick the executor for a request by matching it against the URL map."""
+        adapter = app.url_map.bind_to_environ(environ)
+        try:
+            endpoint, _ = adapter.match()
+        except (HTTPException, RequestRedirect):
+            return self.readers
+        if (endpoint, environ['REQUEST_METHOD']) in WRITE_ENDPOINTS:
+            return self.writer
+        return self.readers
+
+    def shutdown(self):
+        self.readers.shutdown(wait=True)
+        self.writer.shutdown(wait=True)
+
+
+def _build_environ(scope, body):
+    """Translate an ASGI http scope into a WSGI environ (PEP 3333)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    path = scope.get('path', '/')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': path.encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin1').upper().replace('-', '_')
+        value = raw_value.decode('latin1')
+        if name == 'CONTENT_TYPE':
+            key = 'CONTENT_TYPE'
+        elif name == 'CONTENT_LENGTH':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+    return environ
+
+
+class FlaskASGI:
+    """ASGI application running a Flask app on DBExecutors."""
+
+    def __init__(self, app, read_threads=ASGI_READ_THREADS):
+        self.app = app
+        self.read_threads = read_threads
+        self.executors = None
+
+    def _executors(self):
+        if self.executors is None:
+            self.executors = DBExecutors(self.read_threads)
+        return self.executors
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError('unsupported ASGI scope type: {}'.format(scope['type']))
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._executors()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.executors is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, self.executors.shutdown)
+                    self.executors = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunks.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+
+        environ = _build_environ(scope, b''.join(chunks))
+        executors = self._executors()
+        pool = executors.for_request(self.app, environ)
+        loop = asyncio.get_running_loop()
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers]
+            return lambda data: None
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run_app():
+            # The whole response, including a streamed body, is produced on
+            # one pool thread (Flask contexts are bound to it); chunks are
+            # handed to the event loop as they come.
+            body = self.app(environ, start_response)
+            started = False
+            try:
+                for chunk in body:
+                    if not chunk:
+                        continue
+                    if not started:
+                        send_from_thread({'type': 'http.response.start', 'status': response['status'],
+                                          'headers': response['headers']})
+                        started = True
+                    send_from_thread({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                close = getattr(body, 'close', None)
+                if close is not None:
+                    close()
+            if not started:
+                send_from_thread({'type': 'http.response.start', 'status': response['status'],
+                                  'headers': response['headers']})
+            send_from_thread({'type': 'http.response.body', 'body': b''})
+
+        await loop.run_in_executor(pool, run_app)
+
+
+asgi_app = FlaskASGI(app)
@@ -0,0 +1,199 @@
+"""
+Immutable, memory-mapped catalog snapshot shared by all gunicorn workers.
+
+A writer (scripts/build_catalog_snapshot.py) dumps products with their best
+price into one file and swaps it in with os.replace(). Workers mmap the
+file read-only, so the OS page cache holds a single copy no matter how many
+workers there are, and a worker sees the new file on its next request.
+
+File layout (little endian, sections 8-byte aligned):
+
+    header     magic 'KZCS', format u32, catalog_version u64, count u64, blob_len u64
+    ids        int64[count]      product ids, ascending
+    prices     int64[count]      best price, -1 = no price
+    store_ids  int32[count]      store with the best price, -1 = none
+    offsets    uint32[4*count+1] start of name/color/storage/image_url of
+                                 product i at 4*i+field, end at the next entry
+    blob       utf-8 strings; a single NUL byte encodes NULL
+"""
+
+from array import array
+from bisect import bisect_left
+import mmap
+import os
+import struct
+
+MAGIC = b'KZCS'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIQQQ')
+STRING_FIELDS = ('name', 'color', 'storage', 'image_url')
+_NULL = b'\x00'
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def write_snapshot(rows, path, catalog_version):
+    """Write `rows` (id, name, color, storage, image_url, price, store_id) sorted by id.
+
+    The file is written next to `path` and renamed over it, so readers
+    either see the old snapshot or the complete new one.
+    """
+    ids, prices, store_ids = array('q'), array('q'), array('i')
+    offsets, blob = array('I', [0]), bytearray()
+    for pid, name, color, storage, image_url, price, store_id in rows:
+        ids.append(pid)
+        prices.append(-1 if price is None else price)
+        store_ids.append(-1 if store_id is None else store_id)
+        for value in (name, color, storage, image_url):
+            blob += _NULL if value is None else str(value).encode('utf8')
+            offsets.append(len(blob))
+
+    n = len(ids)
+    sections = [ids.tobytes(), prices.tobytes(), store_ids.tobytes(), offsets.tobytes(), bytes(blob)]
+    tmp = '{}.tmp.{}'.format(path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, catalog_version, n, len(blob)))
+        pos = HEADER.size
+        for data in sections:
+            pad = _align(pos) - pos
+            f.write(b'\x00' * pad + data)
+            pos += pad + len(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return n
+
+
+def build_snapshot(conn, path):
+    """Dump the current catalog from SQLite into `path`. Returns (count, catalog_version)."""
+    # One read transaction: the version matches the rows we dump
+    conn.execute('BEGIN')
+    try:
+        try:
+            version = conn.execute('SELECT version FROM catalog_meta WHERE id = 1').fetchone()[0]
+        except Exception:
+            version = 0
+        # With MIN(), SQLite takes the bare store_id from the cheapest row
+        rows = conn.execute('''
+            SELECT p.id, p.name, p.color, p.storage, p.image_url, MIN(pr.price), pr.store_id
+            FROM products p
+            LEFT JOIN prices pr ON pr.product_id = p.id
+            GROUP BY p.id
+            ORDER BY p.id
+        ''')
+        count = write_snapshot(rows, path, version)
+    finally:
+        conn.rollback()
+    return count, version
+
+
+class CatalogSnapshot:
+    """Read-only view over a snapshot file; lookups by id never copy the columns."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, self.catalog_version, n, blob_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError('not a catalog snapshot (format {}): {}'.format(fmt, path))
+        mv = memoryview(self._mm)
+        pos = HEADER.size
+
+        def take(nbytes, fmt_char):
+            nonlocal pos
+            pos = _align(pos)
+            view = mv[pos:pos + nbytes].cast(fmt_char)
+            pos += nbytes
+            return view
+
+        self.ids = take(8 * n, 'q')
+        self.prices = take(8 * n, 'q')
+        self.store_ids = take(4 * n, 'i')
+        self._offsets = take(4 * (len(STRING_FIELDS) * n + 1), 'I')
+        self._blob_start = _align(pos)
+        self._first_id = self.ids[0] if n else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def index_of(self, product_id):
+        """Row index of `product_id`, -1 if absent. O(1) for dense ids, else binary search."""
+        ids = self.ids
+        n = len(ids)
+        i = product_id - self._first_id
+        if 0 <= i < n and ids[i] == product_id:
+            return i
+        i = bisect_left(ids, product_id)
+        if i < n and ids[i] == product_id:
+            return i
+        return -1
+
+    def price(self, product_id):
+        i = self.index_of(product_id)
+        if i < 0:
+            return None
+        p = self.prices[i]
+        return None if p < 0 else p
+
+    def _string(self, k):
+        start = self._blob_start + self._offsets[k]
+        raw = self._mm[start:self._blob_start + self._offsets[k + 1]]
+        return None if raw == _NULL else raw.decode('utf8')
+
+    def _row(self, i):
+        k = len(STRING_FIELDS) * i
+        price = self.prices[i]
+        store_id = self.store_ids[i]
+        return {
+            'id': self.ids[i],
+            'name': self._string(k),
+            'color': self._string(k + 1),
+            'storage': self._string(k + 2),
+            'image_url': self._string(k + 3),
+            'price': None if price < 0 else price,
+            'store_id': None if store_id < 0 else store_id,
+        }
+
+    def get(self, product_id):
+        """Product dict shaped like the `SELECT p.*, MIN(pr.price) as price` rows, or None."""
+        i = self.index_of(product_id)
+        return None if i < 0 else self._row(i)
+
+    def products(self, ids=None):
+        """Dicts for `ids` (unknown ids skipped), or the whole catalog; in id order."""
+        if ids is None:
+            return [self._row(i) for i in range(len(self.ids))]
+        rows = []
+        for pid in sorted(set(ids)):
+            i = self.index_of(pid)
+            if i >= 0:
+                rows.append(self._row(i))
+        return rows
+
+
+class SnapshotReader:
+    """Holds the current CatalogSnapshot and reopens it when the file is replaced."""
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._stat_key = None
+
+    def current(self):
+        """The latest snapshot, or None when there is no (valid) snapshot file."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            self._snapshot = self._stat_key = None
+            return None
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if key != self._stat_key:
+            try:
+                snapshot = CatalogSnapshot(self.path)
+            except (OSError, ValueError, struct.error):
+                return self._snapshot
+            # The old mapping is released once no request holds it any more
+            self._snapshot, self._stat_key = snapshot, key
+        return self._snapshot
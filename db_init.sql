@@ -84,6 +84,8 @@ VALUES
 (1, 'Kaspi Gold', '**** 4300', 4300000),
 (1, 'Halyk Bank', '**** 2100', 2100000);
 
+CREATE INDEX IF NOT EXISTS idx_bank_cards_user ON bank_cards (user_id, created_at);
+
 -- Order history to record payments
 CREATE TABLE IF NOT EXISTS order_history (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -95,3 +97,93 @@ CREATE TABLE IF NOT EXISTS order_history (
     FOREIGN KEY (user_id) REFERENCES users (id),
     FOREIGN KEY (card_id) REFERENCES bank_cards (id)
 );
+
+-- Catalog version: bumped by triggers on every products/prices write.
+-- Rendered product cards are cached per (product id, version).
+CREATE TABLE IF NOT EXISTS catalog_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO catalog_meta (id, version) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS products_insert_catalog_version AFTER INSERT ON products
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS products_update_catalog_version AFTER UPDATE ON products
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS products_delete_catalog_version AFTER DELETE ON products
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS prices_insert_catalog_version AFTER INSERT ON prices
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS prices_update_catalog_version AFTER UPDATE ON prices
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS prices_delete_catalog_version AFTER DELETE ON prices
+BEGIN UPDATE catalog_meta SET version = version + 1 WHERE id = 1; END;
+
+-- Background job queue (see jobs.py) and order line items written by the order_paid job
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at REAL NOT NULL,
+    locked_by TEXT,
+    locked_at REAL,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs (status, run_at);
+
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    price INTEGER,
+    FOREIGN KEY (order_id) REFERENCES order_history (id),
+    FOREIGN KEY (product_id) REFERENCES products (id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_order_items_order_product ON order_items (order_id, product_id);
+
+-- Store price index written by price_analytics.py (product_price_stats and
+-- price_outliers are rebuilt by each run)
+CREATE INDEX IF NOT EXISTS idx_prices_product_store_price ON prices (product_id, store_id, price);
+CREATE TABLE IF NOT EXISTS store_price_index (
+    store_id INTEGER PRIMARY KEY,
+    price_index REAL,
+    products INTEGER NOT NULL,
+    cheapest_count INTEGER NOT NULL,
+    outliers INTEGER NOT NULL,
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Similar products (see similar_products.py, filled by scripts/build_similar_products.py)
+CREATE TABLE IF NOT EXISTS product_models (
+    product_id INTEGER PRIMARY KEY,
+    model_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_product_models_key ON product_models (model_key);
+CREATE TABLE IF NOT EXISTS similar_products (
+    product_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    similar_id INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (product_id, rank)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_similar_products_similar ON similar_products (similar_id);
+CREATE TABLE IF NOT EXISTS similarity_dirty (
+    product_id INTEGER NOT NULL UNIQUE
+);
+CREATE TRIGGER IF NOT EXISTS products_insert_similarity_dirty AFTER INSERT ON products
+BEGIN INSERT OR REPLACE INTO similarity_dirty (product_id) VALUES (NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS products_update_similarity_dirty AFTER UPDATE ON products
+BEGIN INSERT OR REPLACE INTO similarity_dirty (product_id) VALUES (NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS products_delete_similarity_dirty AFTER DELETE ON products
+BEGIN INSERT OR REPLACE INTO similarity_dirty (product_id) VALUES (OLD.id); END;
+CREATE TRIGGER IF NOT EXISTS prices_insert_similarity_dirty AFTER INSERT ON prices
+BEGIN INSERT OR REPLACE INTO similarity_dirty (product_id) VALUES (NEW.product_id); END;
+CREATE TRIGGER IF NOT EXISTS prices_update_similarity_dirty AFTER UPDATE ON prices
+BEGIN INSERT OR REPLACE INTO similarity_dirty (product_id) VALUES (NEW.product_id); END;
+CREATE TRIGGER IF NOT EXISTS prices_delete_similarity_dirty AFTER DELETE ON prices
+BEGIN INSERT OR REPLACE INTO similarity_dirty (product_id) VALUES (OLD.product_id); END;
@@ -0,0 +1,227 @@
+"""
+Faceted filtering for the catalog: color, storage, store and price bucket.
+
+FacetIndex keeps one bitset per facet value (a Python int, bit i = product
+at position i). A query ANDs the selected values (OR inside one facet) and
+the counts for every facet value are popcounts of the value's bitset with
+the filters of the *other* facets, so a selected color still shows how many
+products each other color would give.
+
+The index is built once per catalog version (see catalog_meta in app.py)
+and shared by all requests of the process. Every price write bumps the
+version, so after the first build a new version is loaded by a background
+thread while requests keep getting the previous index; only the very first
+request of a process waits for a build.
+"""
+
+import re
+import threading
+
+FACETS = ('color', 'storage', 'store', 'price')
+
+# Best-price buckets in tenge: (low, high), high=None means open ended
+PRICE_BUCKETS = [
+    (0, 300000),
+    (300000, 500000),
+    (500000, 800000),
+    (800000, 1000000),
+    (1000000, None),
+]
+
+_NONZERO = re.compile(b'[^\x00]')
+
+
+def _popcount(n):
+    # int.bit_count() is Python 3.10+; the project still runs on 3.9
+    return bin(n).count('1')
+
+
+def price_bucket(price):
+    """Return the bucket key for a price ('300000-500000', '1000000+'), None if unknown."""
+    if price is None:
+        return None
+    for low, high in PRICE_BUCKETS:
+        if high is None:
+            if price >= low:
+                return f'{low}+'
+        elif low <= price < high:
+            return f'{low}-{high}'
+    return None
+
+
+def price_bucket_label(key):
+    if key.endswith('+'):
+        return '{:,.0f} ₸ +'.format(int(key[:-1]))
+    low, high = key.split('-')
+    return '{:,.0f} – {:,.0f} ₸'.format(int(low), int(high))
+
+
+class FacetIndex:
+    """Bitset facet index over the products of one catalog version."""
+
+    def __init__(self, products, product_stores=(), store_names=None, version=None):
+        """
+        products: iterable of (id, color, storage, best_price)
+        product_stores: iterable of (product_id, store_id) — a product can be in several stores
+        store_names: {store_id: name} for labels
+        """
+        self.version = version
+        self.ids = []
+        position = {}
+        raw = {f: {} for f in FACETS}
+
+        def add(facet, value, i):
+            if value is None or value == '':
+                return
+            ba = raw[facet].get(value)
+            if ba is None:
+                ba = raw[facet][value] = bytearray(nbytes)
+            ba[i >> 3] |= 1 << (i & 7)
+
+        products = list(products)
+        nbytes = (len(products) + 7) // 8
+        for i, (pid, color, storage, price) in enumerate(products):
+            position[pid] = i
+            self.ids.append(pid)
+            add('color', color, i)
+            add('storage', storage, i)
+            add('price', price_bucket(price), i)
+        for pid, store_id in product_stores:
+            i = position.get(pid)
+            if i is not None and store_id is not None:
+                add('store', str(store_id), i)
+
+        self.nbytes = nbytes
+        self.all = (1 << len(self.ids)) - 1
+        self.bits = {f: {v: int.from_bytes(ba, 'little') for v, ba in raw[f].items()} for f in FACETS}
+        # Unfiltered counts, used whenever no other facet narrows the set
+        self.totals = {f: {v: _popcount(b) for v, b in self.bits[f].items()} for f in FACETS}
+        self.labels = {f: {v: v for v in self.bits[f]} for f in FACETS}
+        for v in self.bits['price']:
+            self.labels['price'][v] = price_bucket_label(v)
+        for v in self.bits['store']:
+            self.labels['store'][v] = (store_names or {}).get(int(v), v)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def values(self, facet):
+        """Facet values in display order: price buckets ascending, the rest by label."""
+        if facet == 'price':
+            order = [price_bucket(low) for low, _ in PRICE_BUCKETS]
+            return [v for v in order if v in self.bits['price']]
+        return sorted(self.bits[facet], key=lambda v: str(self.labels[facet][v]))
+
+    def _masks(self, filters):
+        masks = {}
+        for facet, values in (filters or {}).items():
+            if facet not in self.bits or not values:
+                continue
+            m = 0
+            for v in values:
+                m |= self.bits[facet].get(v, 0)
+            masks[facet] = m
+        return masks
+
+    def search(self, filters, limit=None):
+        """Return (product ids, counts) for `filters` ({facet: [values]}).
+
+        counts is {facet: {value: n}}; for each facet the count ignores that
+        facet's own selection (multi-select facets).
+        """
+        masks = self._masks(filters)
+        matched = self.all
+        for m in masks.values():
+            matched &= m
+
+        counts = {}
+        for facet in FACETS:
+            others = [m for other, m in masks.items() if other != facet]
+            if not others:
+                counts[facet] = dict(self.totals[facet])
+                continue
+            base = self.all
+            for m in others:
+                base &= m
+            counts[facet] = {v: _popcount(b & base) for v, b in self.bits[facet].items()}
+        return self._decode(matched, limit), counts
+
+    def _decode(self, mask, limit=None):
+        """Product ids for the set bits of `mask`, in catalog order."""
+        if not mask:
+            return []
+        ids = self.ids
+        out = []
+        # Skip zero bytes at C speed, only look at bytes that have bits set
+        for m in _NONZERO.finditer(mask.to_bytes(self.nbytes, 'little')):
+            byte = m.group()[0]
+            base = m.start() << 3
+            for bit in range(8):
+                if byte >> bit & 1:
+                    out.append(ids[base + bit])
+                    if limit is not None and len(out) >= limit:
+                        return out
+        return out
+
+
+def load_facet_index(conn, version=None):
+    """Build a FacetIndex from the products/prices/stores tables."""
+    products = conn.execute('''
+        SELECT p.id, p.color, p.storage, MIN(pr.price)
+        FROM products p
+        LEFT JOIN prices pr ON pr.product_id = p.id
+        GROUP BY p.id
+        ORDER BY p.id
+    ''').fetchall()
+    product_stores = conn.execute('SELECT DISTINCT product_id, store_id FROM prices').fetchall()
+    store_names = {r[0]: r[1] for r in conn.execute('SELECT id, name FROM stores').fetchall()}
+    return FacetIndex((tuple(r) for r in products), (tuple(r) for r in product_stores), store_names, version)
+
+
+_index = None
+_index_lock = threading.Lock()
+# Version being loaded by the background rebuild thread, None when idle
+_rebuilding = None
+
+
+def _rebuild(connect, version):
+    global _index, _rebuilding
+    try:
+        conn = connect()
+        try:
+            _index = load_facet_index(conn, version)
+        finally:
+            conn.close()
+    finally:
+        with _index_lock:
+            _rebuilding = None
+
+
+def get_facet_index(conn, version, connect=None):
+    """Process-wide FacetIndex for catalog `version`.
+
+    With no index yet it is built on `conn`. On a version change one
+    background rebuild is started on a new connection from `connect()` and
+    the previous (stale) index is returned until it is done; without
+    `connect` the rebuild runs inline.
+    """
+    global _index, _rebuilding
+    idx = _index
+    if idx is not None and idx.version == version:
+        return idx
+    if idx is None or connect is None:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                _index = load_facet_index(conn, version)
+            return _index
+    with _index_lock:
+        if _rebuilding is None:
+            _rebuilding = version
+            threading.Thread(target=_rebuild, args=(connect, version),
+                             name='facet-index-rebuild', daemon=True).start()
+    return idx
+
+
+def filters_from_args(args):
+    """Read ?color=..&storage=..&store=..&price=.. (repeatable) into a filters dict."""
+    return {f: args.getlist(f) for f in FACETS if args.getlist(f)}
@@ -0,0 +1,83 @@
+"""
+Jinja fragment cache for rendered template snippets (product cards etc).
+
+Usage in a template:
+
+    {% cache 'card-body', p.id, catalog_version %}
+        ... expensive markup ...
+    {% endcache %}
+
+All expressions after `cache` form the key. The first render stores the
+HTML, later renders with the same key return the stored string without
+running the block. Keep per-user bits (favorite state, cart badges) out of
+the block, or put them into the key.
+"""
+
+from collections import OrderedDict
+import threading
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+
+class LRUFragmentCache:
+    """Small thread-safe LRU dict for rendered fragments."""
+
+    def __init__(self, maxsize=8192):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the `{% cache key, ... %}...{% endcache %}` tag."""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=LRUFragmentCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        keys = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            keys.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        key = nodes.Tuple(keys, 'load', lineno=lineno)
+        return nodes.CallBlock(self.call_method('_cache_support', [key]), [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, key, caller):
+        cache = self.environment.fragment_cache
+        rv = cache.get(key)
+        if rv is None:
+            rv = Markup(caller())
+            cache.set(key, rv)
+        return rv
@@ -0,0 +1,149 @@
+"""
+Persistent Jinja bytecode cache, so a cold start (e.g. a new Vercel
+instance) loads compiled templates from disk instead of parsing and
+compiling base.html, navbar.html, footer.html and the page on first render.
+
+Vercel has no build step for app.py and its function directory is
+read-only, so the cache is committed (.jinja_cache, bundled via
+vercel.json includeFiles). Entries only load on the Python minor version
+that wrote them, so the deployment runtime is pinned in .python-version
+and compile_templates.py refuses to run on any other version. Rebuild
+after changing templates:
+
+    python3 scripts/compile_templates.py --clear
+    python3 scripts/compile_templates.py --check   # what tests/test_jinja_cache.py asserts
+
+stale_templates() lists templates whose committed entry is missing, from
+another Python version or for an older source. Cache keys use paths
+relative to the app, so a cache built in a checkout loads wherever the
+app is installed.
+
+The cache directory is KAZPRICE_JINJA_CACHE (default: .jinja_cache next to
+app.py, 'off' disables it). When it is read-only (or can't be created),
+cached templates are still loaded from it and newly compiled ones go to
+FALLBACK_CACHE_DIR under the system temp directory (/tmp on Vercel), which
+warm instances reuse.
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache
+from jinja2.bccache import bc_version
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(APP_ROOT, '.jinja_cache')
+FALLBACK_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'kazprice-jinja-cache')
+PYTHON_VERSION_FILE = os.path.join(APP_ROOT, '.python-version')
+
+
+class SafeFileSystemBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache that never fails a render because the cache can't be written.
+
+    Entries that can't be written to `directory` go to `fallback_directory`
+    (if given), and lookups check both.
+    """
+
+    def __init__(self, directory, fallback_directory=None):
+        super().__init__(directory)
+        self.fallback = None
+        if fallback_directory and os.path.abspath(fallback_directory) != os.path.abspath(directory):
+            self.fallback = FileSystemBytecodeCache(fallback_directory)
+
+    def get_cache_key(self, name, filename=None):
+        if filename is not None:
+            try:
+                filename = os.path.relpath(filename, APP_ROOT)
+            except ValueError:
+                # Other drive on Windows: keep the absolute path
+                pass
+        return super().get_cache_key(name, filename)
+
+    def load_bytecode(self, bucket):
+        super().load_bytecode(bucket)
+        if bucket.code is None and self.fallback is not None:
+            self.fallback.load_bytecode(bucket)
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+            return
+        except OSError:
+            pass
+        if self.fallback is None:
+            return
+        try:
+            os.makedirs(self.fallback.directory, exist_ok=True)
+            self.fallback.dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+def cache_dir():
+    return os.environ.get('KAZPRICE_JINJA_CACHE', DEFAULT_CACHE_DIR)
+
+
+def init_app(app, directory=None, fallback_directory=FALLBACK_CACHE_DIR):
+    """Attach the on-disk bytecode cache to the app's Jinja environment."""
+    directory = directory or cache_dir()
+    if directory == 'off':
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        # Read-only filesystem without a prebuilt cache: only the fallback is usable
+        if not os.path.isdir(directory):
+            if not fallback_directory:
+                return None
+            directory, fallback_directory = fallback_directory, None
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                return None
+    app.jinja_env.bytecode_cache = SafeFileSystemBytecodeCache(directory, fallback_directory)
+    return app.jinja_env.bytecode_cache
+
+
+def pinned_python():
+    """(major, minor) the deployment runs, from .python-version; None if not pinned."""
+    try:
+        with open(PYTHON_VERSION_FILE) as f:
+            major, minor = f.read().strip().split('.')[:2]
+        return int(major), int(minor)
+    except (OSError, ValueError):
+        return None
+
+
+def bytecode_magic(version):
+    """Header of the cache entries Jinja writes under Python `version` (major, minor)."""
+    return b'j2' + pickle.dumps(bc_version, 2) + pickle.dumps((version[0] << 24) | version[1], 2)
+
+
+def stale_templates(env, directory=DEFAULT_CACHE_DIR, version=None):
+    """Templates of `env` without a usable entry in `directory` for Python `version`
+    (default: the pinned one): missing, written by another Python, or for an older source.
+    """
+    magic = bytecode_magic(version or pinned_python() or sys.version_info[:2])
+    bcc = SafeFileSystemBytecodeCache(directory)
+    stale = []
+    for name in env.list_templates(filter_func=lambda name: name.endswith('.html')):
+        source, filename, _ = env.loader.get_source(env, name)
+        path = os.path.join(directory, bcc.pattern % bcc.get_cache_key(name, filename))
+        try:
+            with open(path, 'rb') as f:
+                fresh = f.read(len(magic)) == magic and pickle.load(f) == bcc.get_source_checksum(source)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            fresh = False
+        if not fresh:
+            stale.append(name)
+    return stale
+
+
+def compile_templates(env):
+    """Load every template once so its bytecode lands in the cache. Returns the names."""
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        env.get_template(name)
+    return names
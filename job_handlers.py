@@ -0,0 +1,40 @@
+"""
+Handlers for the background jobs enqueued by app.py, run by
+
+    python3 scripts/job_queue.py work --db kazprice.db
+
+Importing this module only registers the handlers with jobs.py. Unlike
+importing app, it never opens or migrates a database, so workers can serve
+any --db from any working directory.
+"""
+
+import jobs
+
+
+def ensure_schema(conn):
+    """Create the jobs table and the tables the handlers write to. The caller commits."""
+    jobs.ensure_schema(conn)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            price INTEGER,
+            FOREIGN KEY (order_id) REFERENCES order_history (id),
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    ''')
+    # One row per product of an order, so a re-run order_paid job adds nothing twice
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' "
+                        "AND name = 'idx_order_items_order_product'").fetchone():
+        conn.execute('DELETE FROM order_items WHERE id NOT IN '
+                     '(SELECT MIN(id) FROM order_items GROUP BY order_id, product_id)')
+        conn.execute('CREATE UNIQUE INDEX idx_order_items_order_product ON order_items (order_id, product_id)')
+
+
+@jobs.handler('order_paid')
+def record_order_items(conn, payload):
+    """Store the line items of a paid order; enqueued by app.process_payment(). Safe to run twice."""
+    conn.executemany('INSERT OR IGNORE INTO order_items (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)',
+                     [(payload['order_id'], it['product_id'], it['quantity'], it['price']) for it in payload['items']])
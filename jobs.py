@@ -0,0 +1,200 @@
+"""
+Lightweight background job queue stored in the `jobs` table.
+
+    jobs.enqueue(conn, 'order_paid', {'order_id': 7})   # inside the request's transaction
+    python3 scripts/job_queue.py work -n 4               # worker processes
+    python3 scripts/job_queue.py status                  # queue depth
+
+- enqueue() uses the caller's connection, so a job is committed atomically
+  with the data it refers to (e.g. the payment ledger).
+- claim() is a single `UPDATE ... RETURNING`, so two workers never get the
+  same job.
+- A handler runs on the worker's connection and its writes are committed
+  together with the job's `done` status.
+- Failed jobs are retried with exponential backoff; after `max_attempts`
+  they are moved to the dead-letter state (`status = 'dead'`).
+- Jobs stuck in `running` longer than the visibility timeout (worker
+  crashed) go back to `queued`, or to `dead` when that was their last
+  attempt.
+- complete()/fail() only touch a job still locked by the worker that
+  claimed it. A worker that lost its job to the reaper rolls back the
+  handler's writes instead of committing them a second time.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import time
+import traceback
+
+QUEUED, RUNNING, DONE, DEAD = 'queued', 'running', 'done', 'dead'
+# run_job() result when the job was requeued and claimed by someone else meanwhile
+LOST = 'lost'
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0          # seconds, doubled per attempt
+BACKOFF_MAX = 3600.0
+VISIBILITY_TIMEOUT = 300.0  # seconds a job may stay `running`
+
+_handlers = {}
+
+
+def handler(kind):
+    """Register the function handling jobs of `kind`: fn(conn, payload)."""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def ensure_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL DEFAULT '{}',
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            run_at REAL NOT NULL,
+            locked_by TEXT,
+            locked_at REAL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status_run_at ON jobs (status, run_at)')
+
+
+def enqueue(conn, kind, payload=None, delay=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Add a job using `conn`; the caller commits. Returns the job id."""
+    cur = conn.execute(
+        'INSERT INTO jobs (kind, payload, status, max_attempts, run_at) VALUES (?, ?, ?, ?, ?)',
+        (kind, json.dumps(payload or {}, ensure_ascii=False), QUEUED, max_attempts, time.time() + delay))
+    return cur.lastrowid
+
+
+def claim(conn, worker_id, now=None):
+    """Atomically take the next due job. Returns a Row or None. Commits."""
+    now = time.time() if now is None else now
+    row = conn.execute('''
+        UPDATE jobs SET status = ?, locked_by = ?, locked_at = ?, attempts = attempts + 1
+        WHERE id = (
+            SELECT id FROM jobs WHERE status = ? AND run_at <= ?
+            ORDER BY run_at, id LIMIT 1
+        )
+        RETURNING id, kind, payload, attempts, max_attempts, locked_by
+    ''', (RUNNING, worker_id, now, QUEUED, now)).fetchone()
+    conn.commit()
+    return row
+
+
+_OWNED = 'id = ? AND status = ? AND locked_by = ?'
+
+
+def complete(conn, job):
+    """Mark a claimed job done. False if the worker no longer holds it."""
+    cur = conn.execute('UPDATE jobs SET status = ?, locked_by = NULL, last_error = NULL WHERE ' + _OWNED,
+                       (DONE, job['id'], RUNNING, job['locked_by']))
+    return cur.rowcount == 1
+
+
+def fail(conn, job, error, now=None):
+    """Schedule a retry with backoff, or dead-letter the job when out of attempts.
+    Returns the new status, LOST if the worker no longer holds the job.
+    """
+    now = time.time() if now is None else now
+    if job['attempts'] >= job['max_attempts']:
+        status, run_at = DEAD, None
+    else:
+        status = QUEUED
+        run_at = now + min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (job['attempts'] - 1))
+    cur = conn.execute('UPDATE jobs SET status = ?, locked_by = NULL, run_at = COALESCE(?, run_at), last_error = ? '
+                       'WHERE ' + _OWNED, (status, run_at, error, job['id'], RUNNING, job['locked_by']))
+    return status if cur.rowcount == 1 else LOST
+
+
+def requeue_stale(conn, timeout=VISIBILITY_TIMEOUT, now=None):
+    """Put jobs of crashed workers back in the queue, dead-lettering those
+    that used their last attempt. Returns the number of jobs touched.
+    """
+    now = time.time() if now is None else now
+    cur = conn.execute('''
+        UPDATE jobs SET
+            status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END,
+            last_error = CASE WHEN attempts >= max_attempts THEN ? ELSE last_error END,
+            locked_by = NULL
+        WHERE status = ? AND locked_at < ?
+    ''', (DEAD, QUEUED, 'worker timed out after {:.0f}s'.format(timeout), RUNNING, now - timeout))
+    conn.commit()
+    return cur.rowcount
+
+
+def retry_dead(conn, job_ids=None):
+    """Move dead-letter jobs (all, or the given ids) back to the queue."""
+    sql = 'UPDATE jobs SET status = ?, attempts = 0, run_at = ? WHERE status = ?'
+    params = [QUEUED, time.time(), DEAD]
+    if job_ids:
+        sql += ' AND id IN ({})'.format(','.join('?' * len(job_ids)))
+        params += list(job_ids)
+    cur = conn.execute(sql, params)
+    conn.commit()
+    return cur.rowcount
+
+
+def queue_depth(conn):
+    """{status: {kind: count}} for the whole table."""
+    depth = {}
+    for status, kind, n in conn.execute('SELECT status, kind, COUNT(*) FROM jobs GROUP BY status, kind'):
+        depth.setdefault(status, {})[kind] = n
+    return depth
+
+
+def run_job(conn, job):
+    """Run one claimed job and record the outcome. Returns the new status."""
+    fn = _handlers.get(job['kind'])
+    try:
+        if fn is None:
+            raise LookupError('no handler for job kind {!r}'.format(job['kind']))
+        fn(conn, json.loads(job['payload']))
+        if not complete(conn, job):
+            conn.rollback()
+            return LOST
+        conn.commit()
+        return DONE
+    except Exception:
+        conn.rollback()
+        status = fail(conn, job, traceback.format_exc(limit=5))
+        conn.commit()
+        return status
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def work(db_path, poll_interval=0.5, max_jobs=None, stop_when_empty=False, worker_id=None):
+    """Worker loop: claim and run jobs until stopped. Returns the number of jobs run."""
+    worker_id = worker_id or '{}:{}'.format(socket.gethostname(), os.getpid())
+    conn = connect(db_path)
+    processed = 0
+    last_reap = 0.0
+    try:
+        while max_jobs is None or processed < max_jobs:
+            if time.time() - last_reap > VISIBILITY_TIMEOUT / 2:
+                requeue_stale(conn)
+                last_reap = time.time()
+            job = claim(conn, worker_id)
+            if job is None:
+                if stop_when_empty:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(conn, job)
+            processed += 1
+    finally:
+        conn.close()
+    return processed
@@ -0,0 +1,272 @@
+"""
+Vectorized price analytics over the whole `prices` table.
+
+    python3 scripts/run_price_analytics.py --db kazprice.db
+
+Reads `prices` in chunks of whole products (keyset pagination on
+product_id, so every product's prices land in one chunk) into NumPy arrays
+and computes per chunk:
+
+- per-product median / MAD / min / max and the ratio price / median;
+- robust z-score 0.6745 * (price - median) / MAD; a price is an outlier when
+  |z| > OUTLIER_Z and it is more than OUTLIER_MIN_DEVIATION off the median,
+  or when it is off by more than OUTLIER_RATIO either way (catches a feed
+  listing an iPhone at 9 259 ₸ even for products with only two prices);
+- per-store accumulators for the store price index (geometric mean of
+  price / median over products sold by at least two stores, outliers
+  excluded) and how often the store is the cheapest.
+
+Only the per-store accumulators live across chunks, so memory stays flat.
+Results go to product_price_stats, price_outliers and store_price_index;
+the first two are built as *_new tables and renamed in at the end.
+"""
+
+import itertools
+import time
+
+import numpy as np
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+OUTLIER_Z = 3.5
+OUTLIER_MIN_DEVIATION = 0.10
+OUTLIER_RATIO = 5.0
+MAD_TO_Z = 0.6745
+
+
+def ensure_schema(conn):
+    # Covering index: the chunked scan never touches the table rows
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_prices_product_store_price ON prices (product_id, store_id, price)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS store_price_index (
+            store_id INTEGER PRIMARY KEY,
+            price_index REAL,
+            products INTEGER NOT NULL,
+            cheapest_count INTEGER NOT NULL,
+            outliers INTEGER NOT NULL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.commit()
+
+
+def _create_result_tables(conn, suffix):
+    conn.execute(f'DROP TABLE IF EXISTS product_price_stats{suffix}')
+    conn.execute(f'''
+        CREATE TABLE product_price_stats{suffix} (
+            product_id INTEGER PRIMARY KEY,
+            n_prices INTEGER NOT NULL,
+            min_price INTEGER,
+            median_price REAL,
+            max_price INTEGER,
+            mad REAL
+        )
+    ''')
+    conn.execute(f'DROP TABLE IF EXISTS price_outliers{suffix}')
+    conn.execute(f'''
+        CREATE TABLE price_outliers{suffix} (
+            price_id INTEGER PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            store_id INTEGER,
+            price INTEGER NOT NULL,
+            median_price REAL NOT NULL,
+            ratio REAL NOT NULL,
+            robust_z REAL
+        )
+    ''')
+
+
+def _fetch(cur):
+    """(product_id, store_id, price) rows -> int64 array of shape (n, 3), no per-row tuples kept."""
+    return np.fromiter(itertools.chain.from_iterable(cur), dtype=np.int64).reshape(-1, 3)
+
+
+def iter_chunks(conn, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield (product_id, store_id, price) int64 arrays, whole products per chunk."""
+    # The price row id is not read here (it makes the scan ~25% slower);
+    # outlier rows are looked up by (product_id, store_id, price) afterwards.
+    sql = '''
+        SELECT product_id, IFNULL(store_id, -1), price FROM prices
+        WHERE product_id >= ? AND price IS NOT NULL
+        ORDER BY product_id LIMIT ?
+    '''
+    start = -(2 ** 63)
+    while True:
+        rows = _fetch(conn.execute(sql, (start, chunk_rows)))
+        if not len(rows):
+            return
+        pids = rows[:, 0]
+        if len(rows) < chunk_rows:
+            yield pids, rows[:, 1], rows[:, 2]
+            return
+        last = pids[-1]
+        if pids[0] == last:
+            # One product bigger than a chunk: read it on its own
+            rows = _fetch(conn.execute('SELECT product_id, IFNULL(store_id, -1), price FROM prices '
+                                       'WHERE product_id = ? AND price IS NOT NULL', (int(last),)))
+            yield rows[:, 0], rows[:, 1], rows[:, 2]
+            start = int(last) + 1
+        else:
+            # The last product may continue in the next chunk; leave it for then
+            keep = pids < last
+            yield pids[keep], rows[keep, 1], rows[keep, 2]
+            start = int(last)
+
+
+def _group_median(values, starts, counts):
+    """Median of each contiguous group; values must be sorted inside each group."""
+    lo = starts + (counts - 1) // 2
+    hi = starts + counts // 2
+    return (values[lo] + values[hi]) / 2.0
+
+
+def analyze_chunk(product_ids, store_ids, prices):
+    """Vectorized statistics for one chunk of whole products.
+
+    Returns (stats, outliers, per_row) where stats are per-product arrays,
+    outliers the flagged rows and per_row the arrays needed for the store index.
+    """
+    order = np.lexsort((prices, product_ids))
+    product_ids, store_ids = product_ids[order], store_ids[order]
+    prices = prices[order].astype(np.float64)
+
+    n = len(prices)
+    starts = np.flatnonzero(np.r_[True, product_ids[1:] != product_ids[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    median = _group_median(prices, starts, counts)
+    median_row = median[group]
+    dev = np.abs(prices - median_row)
+    dev_sorted = dev[np.lexsort((dev, group))]
+    mad = _group_median(dev_sorted, starts, counts)
+    mad_row = mad[group]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(median_row > 0, prices / median_row, 1.0)
+        z = np.where(mad_row > 0, MAD_TO_Z * (prices - median_row) / mad_row,
+                     np.where(dev > 0, np.inf * np.sign(prices - median_row), 0.0))
+    outlier = ((np.abs(z) > OUTLIER_Z) & (np.abs(ratio - 1.0) > OUTLIER_MIN_DEVIATION)) \
+        | (ratio > OUTLIER_RATIO) | (ratio < 1.0 / OUTLIER_RATIO)
+
+    stats = {
+        'product_id': product_ids[starts],
+        'n_prices': counts,
+        'min_price': prices[starts],
+        'median_price': median,
+        'max_price': prices[starts + counts - 1],
+        'mad': mad,
+    }
+    idx = np.flatnonzero(outlier)
+    outliers = {
+        'product_id': product_ids[idx],
+        'store_id': store_ids[idx],
+        'price': prices[idx],
+        'median_price': median_row[idx],
+        'ratio': ratio[idx],
+        'robust_z': z[idx],
+    }
+    # Cheapest store per product, ignoring outlier prices (rows are sorted by price)
+    clean = np.flatnonzero(~outlier)
+    clean_group = group[clean]
+    first_clean = clean[np.r_[True, clean_group[1:] != clean_group[:-1]]] if len(clean) else clean
+    first_clean = first_clean[counts[group[first_clean]] >= 2]
+    per_row = {
+        'store_id': store_ids,
+        'ratio': ratio,
+        'outlier': outlier,
+        'multi_store': counts[group] >= 2,
+        'cheapest_store': store_ids[first_clean],
+    }
+    return stats, outliers, per_row
+
+
+class StoreAccumulator:
+    """Per-store running sums for the price index; size = number of stores."""
+
+    def __init__(self):
+        self.log_sum = np.zeros(0)
+        self.products = np.zeros(0, dtype=np.int64)
+        self.cheapest = np.zeros(0, dtype=np.int64)
+        self.outliers = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, size):
+        if size > len(self.log_sum):
+            pad = size - len(self.log_sum)
+            self.log_sum = np.r_[self.log_sum, np.zeros(pad)]
+            self.products = np.r_[self.products, np.zeros(pad, dtype=np.int64)]
+            self.cheapest = np.r_[self.cheapest, np.zeros(pad, dtype=np.int64)]
+            self.outliers = np.r_[self.outliers, np.zeros(pad, dtype=np.int64)]
+
+    def add(self, per_row):
+        stores = per_row['store_id']
+        known = stores >= 0
+        if not known.any():
+            return
+        self._grow(int(stores[known].max()) + 1)
+        size = len(self.log_sum)
+        use = known & per_row['multi_store'] & ~per_row['outlier']
+        self.log_sum += np.bincount(stores[use], weights=np.log(per_row['ratio'][use]), minlength=size)
+        self.products += np.bincount(stores[use], minlength=size)
+        self.outliers += np.bincount(stores[known & per_row['outlier']], minlength=size)
+        cheapest = per_row['cheapest_store']
+        self.cheapest += np.bincount(cheapest[cheapest >= 0], minlength=size)
+
+    def rows(self):
+        """(store_id, price_index, products, cheapest_count, outliers) for stores seen."""
+        out = []
+        for store_id in np.flatnonzero(self.products + self.outliers + self.cheapest):
+            n = int(self.products[store_id])
+            index = float(np.exp(self.log_sum[store_id] / n)) if n else None
+            out.append((int(store_id), index, n, int(self.cheapest[store_id]), int(self.outliers[store_id])))
+        return out
+
+
+def run(conn, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Full pass over `prices`; replaces the summary tables. Returns a small report dict."""
+    started = time.perf_counter()
+    ensure_schema(conn)
+    _create_result_tables(conn, '_new')
+    conn.commit()
+
+    acc = StoreAccumulator()
+    n_rows = n_products = n_outliers = 0
+    for chunk in iter_chunks(conn, chunk_rows):
+        stats, outliers, per_row = analyze_chunk(*chunk)
+        acc.add(per_row)
+        conn.executemany('INSERT INTO product_price_stats_new VALUES (?, ?, ?, ?, ?, ?)', zip(
+            stats['product_id'].tolist(), stats['n_prices'].tolist(), stats['min_price'].astype(np.int64).tolist(),
+            stats['median_price'].tolist(), stats['max_price'].astype(np.int64).tolist(), stats['mad'].tolist()))
+        # Outliers are rare: resolve their price row ids through the index
+        conn.executemany('''
+            INSERT OR IGNORE INTO price_outliers_new (price_id, product_id, store_id, price, median_price, ratio, robust_z)
+            SELECT id, product_id, store_id, price, ?, ?, ? FROM prices
+            WHERE product_id = ? AND store_id IS ? AND price = ?
+        ''', zip(
+            outliers['median_price'].tolist(), outliers['ratio'].tolist(),
+            [v if np.isfinite(v) else None for v in outliers['robust_z'].tolist()],
+            outliers['product_id'].tolist(), [s if s >= 0 else None for s in outliers['store_id'].tolist()],
+            outliers['price'].astype(np.int64).tolist()))
+        # Short write transactions so the app is never blocked for the whole pass
+        conn.commit()
+        n_rows += len(chunk[0])
+        n_products += len(stats['product_id'])
+        n_outliers += len(outliers['product_id'])
+
+    # Swap the new results in with one short transaction
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DROP TABLE IF EXISTS product_price_stats')
+        conn.execute('ALTER TABLE product_price_stats_new RENAME TO product_price_stats')
+        conn.execute('DROP TABLE IF EXISTS price_outliers')
+        conn.execute('ALTER TABLE price_outliers_new RENAME TO price_outliers')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_price_outliers_product ON price_outliers (product_id)')
+        conn.execute('DELETE FROM store_price_index')
+        conn.executemany('INSERT INTO store_price_index (store_id, price_index, products, cheapest_count, outliers) '
+                         'VALUES (?, ?, ?, ?, ?)', acc.rows())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {'rows': n_rows, 'products': n_products, 'outliers': n_outliers,
+            'stores': len(acc.rows()), 'seconds': time.perf_counter() - started}
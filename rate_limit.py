@@ -0,0 +1,202 @@
+"""
+Request rate limiting with token buckets.
+
+Each limited endpoint gets a bucket per client IP and one per user id
+(logged in) or per session (anonymous). A bucket holds up to `burst` tokens
+and refills at `rate` tokens per second; every request takes one token.
+A request is only charged when every one of its buckets has a token.
+Empty bucket -> 429 with a Retry-After header; an HTML form post (/login,
+/register) gets a flash message and a redirect back to the form instead.
+
+Behind a reverse proxy every request comes from the proxy's address, so
+pass `trusted_proxies` (the number of proxies in front of the app) to take
+the client IP from X-Forwarded-For. Leave it at 0 when the app is reachable
+directly, otherwise clients can pick their own IP.
+
+Two stores:
+- MemoryBucketStore (default): per-process dict with LRU eviction, a check
+  is a dict lookup plus a little float math.
+- SQLiteBucketStore: buckets in a small SQLite file shared by all gunicorn
+  workers, one UPSERT ... RETURNING per check.
+
+    init_app(app, {'login': Limit(rate=5 / 60, burst=10, methods=('POST',))})
+"""
+
+from collections import OrderedDict, namedtuple
+import math
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask import flash, jsonify, redirect, request, session
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+SESSION_KEY = 'rate_limit_id'
+FORM_MIMETYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
+
+# rate: tokens per second, burst: bucket size, methods: limit only these (None = all)
+Limit = namedtuple('Limit', 'rate burst methods', defaults=(None,))
+
+
+class MemoryBucketStore:
+    """In-process token buckets, bounded to `max_keys` (least recently used evicted)."""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        # key -> [tokens, last_refill_ts]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, rate, burst, now=None):
+        """Take one token. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [burst, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                tokens = bucket[0] + (now - bucket[1]) * rate
+                bucket[0] = tokens if tokens < burst else burst
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+            return False, (1 - bucket[0]) / rate
+
+    def refund(self, key, burst):
+        """Give back the token taken by an earlier hit() on `key`."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(burst, bucket[0] + 1)
+
+    def reset(self):
+        """Forget all buckets (every client starts with a full bucket)."""
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Token buckets in a shared SQLite file so all workers see the same counts."""
+
+    # All SET expressions see the old row, so `allowed` and `tokens` are
+    # computed from the same refilled value in one atomic statement.
+    _HIT_SQL = '''
+        INSERT INTO rate_limits (key, tokens, ts, allowed) VALUES (:key, :burst - 1, :now, 1)
+        ON CONFLICT(key) DO UPDATE SET
+            allowed = MIN(:burst, tokens + (:now - ts) * :rate) >= 1,
+            tokens = CASE WHEN MIN(:burst, tokens + (:now - ts) * :rate) >= 1
+                          THEN MIN(:burst, tokens + (:now - ts) * :rate) - 1
+                          ELSE MIN(:burst, tokens + (:now - ts) * :rate) END,
+            ts = :now
+        RETURNING allowed, tokens
+    '''
+
+    def __init__(self, path, idle_ttl=3600, prune_every=1000):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.prune_every = prune_every
+        self._local = threading.local()
+        self._hits = 0
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                ts REAL NOT NULL,
+                allowed INTEGER NOT NULL DEFAULT 1
+            ) WITHOUT ROWID
+        ''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Losing a few bucket updates on power loss is fine
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, rate, burst, now=None):
+        # Wall clock, not monotonic: timestamps are compared across processes
+        now = time.time() if now is None else now
+        conn = self._conn()
+        allowed, tokens = conn.execute(self._HIT_SQL, {'key': key, 'rate': rate, 'burst': burst, 'now': now}).fetchone()
+        self._hits += 1
+        if self._hits % self.prune_every == 0:
+            conn.execute('DELETE FROM rate_limits WHERE ts < ?', (now - self.idle_ttl,))
+        if allowed:
+            return True, 0
+        return False, (1 - tokens) / rate
+
+    def reset(self):
+        """Forget all buckets, for every process sharing the file."""
+        self._conn().execute('DELETE FROM rate_limits')
+
+    def refund(self, key, burst):
+        """Give back the token taken by an earlier hit() on `key`."""
+        self._conn().execute('UPDATE rate_limits SET tokens = MIN(?, tokens + 1) WHERE key = ?', (burst, key))
+
+
+def _too_many_requests(retry_after):
+    retry_after = max(1, int(math.ceil(retry_after)))
+    message = 'Сұраулар тым көп. {} секундтан кейін қайталаңыз.'.format(retry_after)
+    if request.is_json or request.accept_mimetypes.best == 'application/json':
+        resp = jsonify({'status': 'error', 'message': message})
+    elif request.method == 'POST' and request.mimetype in FORM_MIMETYPES:
+        # Browser form: show the message on the form page rather than a bare 429
+        flash(message, 'danger')
+        resp = redirect(request.url, code=303)
+        resp.headers['Retry-After'] = str(retry_after)
+        return resp
+    else:
+        resp = message
+    return resp, 429, {'Retry-After': str(retry_after)}
+
+
+def _client_keys(endpoint):
+    keys = ['ip:{}:{}'.format(endpoint, request.remote_addr)]
+    if 'user_id' in session:
+        keys.append('user:{}:{}'.format(endpoint, session['user_id']))
+    else:
+        if SESSION_KEY not in session:
+            session[SESSION_KEY] = secrets.token_hex(8)
+        keys.append('session:{}:{}'.format(endpoint, session[SESSION_KEY]))
+    return keys
+
+
+def init_app(app, limits, store=None, trusted_proxies=0):
+    """Register a before_request hook enforcing `limits` ({endpoint: Limit})."""
+    if store is None:
+        store = MemoryBucketStore()
+    app.extensions['rate_limit'] = store
+    if trusted_proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies)
+
+    @app.before_request
+    def _check_rate_limit():
+        limit = limits.get(request.endpoint)
+        if limit is None or (limit.methods and request.method not in limit.methods):
+            return None
+        taken = []
+        for key in _client_keys(request.endpoint):
+            allowed, retry_after = store.hit(key, limit.rate, limit.burst)
+            if not allowed:
+                # A refused request costs nothing: otherwise one client hammering
+                # its session bucket would drain the IP bucket shared behind a NAT
+                for k in taken:
+                    store.refund(k, limit.burst)
+                return _too_many_requests(retry_after)
+            taken.append(key)
+        return None
+
+    return store
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sync gunicorn (app:app) vs ASGI mode (uvicorn asgi:asgi_app).
+
+Usage:
+  python3 scripts/bench_asgi.py --db kazprice.db --workers 2 --concurrency 200 --requests 5000
+
+Options:
+  --db PATH          Database to serve (copied to a temp dir, never modified)
+  --workers N        Worker processes for both servers (default: 2)
+  --concurrency N    Simultaneous client connections (default: 200)
+  --requests N       Total requests per server (default: 5000)
+  --path PATH        Request path, may be repeated (default: /main)
+  --only NAME        Run only `sync` or `asgi`
+
+Behavior:
+- Starts each server on a free local port with the same number of workers.
+- Fires the requests from N client threads over keep-alive connections.
+- Prints requests/sec, p50/p99 latency and error count per server.
+- Needs uvicorn: pip install -r requirements-scripts.txt
+"""
+
+import argparse
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Compare sync gunicorn and ASGI serving under concurrency')
+    p.add_argument('--db', default=os.path.join(REPO, 'kazprice.db'), help='Path to sqlite database file')
+    p.add_argument('--workers', type=int, default=2)
+    p.add_argument('--concurrency', type=int, default=200)
+    p.add_argument('--requests', type=int, default=5000)
+    p.add_argument('--path', action='append', help='Request path (repeatable)')
+    p.add_argument('--only', choices=['sync', 'asgi'])
+    return p.parse_args()
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def server_command(kind, port, workers):
+    if kind == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '--pythonpath', REPO, '-w', str(workers),
+                '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app']
+    return [sys.executable, '-m', 'uvicorn', '--app-dir', REPO, '--workers', str(workers),
+            '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning', 'asgi:asgi_app']
+
+
+def wait_ready(port, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/login')
+            conn.getresponse().read()
+            conn.close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_load(port, paths, total, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        for i in counter:
+            path = paths[i % len(paths)]
+            t0 = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status >= 500:
+                    raise OSError(resp.status)
+            except (OSError, http.client.HTTPException):
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                continue
+            local.append(time.perf_counter() - t0)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return elapsed, latencies, errors[0]
+
+
+def bench(kind, args, workdir):
+    port = free_port()
+    proc = subprocess.Popen(server_command(kind, port, args.workers), cwd=workdir)
+    try:
+        if not wait_ready(port):
+            print(f"{kind}: server did not start")
+            return
+        elapsed, lat, errors = run_load(port, args.path or ['/main'], args.requests, args.concurrency)
+        if not lat:
+            print(f"{kind}: all {errors} requests failed")
+            return
+        print(f"{kind:5s} {len(lat) / elapsed:8.0f} req/s   p50 {lat[len(lat) // 2] * 1000:7.1f} ms   "
+              f"p99 {lat[int(len(lat) * 0.99)] * 1000:7.1f} ms   errors {errors}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Database file not found: {args.db}")
+        sys.exit(1)
+    workdir = tempfile.mkdtemp(prefix='kazprice-bench-')
+    try:
+        # Servers open kazprice.db relative to their cwd
+        shutil.copy2(args.db, os.path.join(workdir, 'kazprice.db'))
+        print(f"workers={args.workers} concurrency={args.concurrency} requests={args.requests}")
+        for kind in ('sync', 'asgi'):
+            if args.only in (None, kind):
+                bench(kind, args, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
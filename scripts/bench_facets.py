@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark for facets.FacetIndex on a synthetic catalog.
+
+Usage:
+  python3 scripts/bench_facets.py --products 1000000 --queries 200
+
+Builds an index over N random products (10 colors, 6 storage sizes,
+8 stores, prices 50 000..1 500 000 ₸) and times random filter combinations:
+matched ids (first page) plus counts for every facet value.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from facets import FACETS, FacetIndex
+
+COLORS = ['Black', 'White', 'Blue', 'Оранжевый', 'Темно-синий', 'Silver', 'Gold', 'Green', 'Pink', 'Red']
+STORAGE = ['64GB', '128GB', '256GB', '512GB', '1TB', '2TB']
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Benchmark facet search on a synthetic catalog')
+    p.add_argument('--products', type=int, default=1000000)
+    p.add_argument('--queries', type=int, default=200)
+    p.add_argument('--seed', type=int, default=1)
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    products = [(i, rnd.choice(COLORS), rnd.choice(STORAGE), rnd.randrange(50000, 1500000))
+                for i in range(1, args.products + 1)]
+    stores = [(pid, s) for pid, *_ in products for s in rnd.sample(range(1, 9), rnd.randint(1, 3))]
+
+    t0 = time.perf_counter()
+    index = FacetIndex(products, stores, {i: f'Store {i}' for i in range(1, 9)})
+    print(f"build: {len(index)} products in {time.perf_counter() - t0:.2f}s")
+
+    timings = []
+    for _ in range(args.queries):
+        filters = {}
+        for facet in rnd.sample(FACETS, rnd.randint(1, len(FACETS))):
+            values = index.values(facet)
+            filters[facet] = rnd.sample(values, rnd.randint(1, min(2, len(values))))
+        t0 = time.perf_counter()
+        ids, counts = index.search(filters, limit=60)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+    print(f"search: p50 {timings[len(timings) // 2] * 1000:.2f} ms   "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms   max {timings[-1] * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the job queue (jobs.py).
+
+Usage:
+  python3 scripts/bench_jobs.py --jobs 5000 --workers 1,2,4
+
+For each worker count: a fresh temp database (WAL mode), N no-op jobs
+enqueued in one transaction, then the workers drain the queue. Prints
+jobs/sec per worker count.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jobs
+
+
+@jobs.handler('bench_noop')
+def _noop(conn, payload):
+    pass
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Benchmark job queue throughput')
+    p.add_argument('--jobs', type=int, default=5000)
+    p.add_argument('--workers', default='1,2,4', help='Comma separated worker counts')
+    return p.parse_args()
+
+
+def _drain(db):
+    jobs.work(db, stop_when_empty=True)
+
+
+def bench(n_jobs, n_workers):
+    workdir = tempfile.mkdtemp(prefix='kazprice-jobs-')
+    db = os.path.join(workdir, 'jobs.db')
+    conn = sqlite3.connect(db)
+    conn.execute('PRAGMA journal_mode=WAL')
+    jobs.ensure_schema(conn)
+    for i in range(n_jobs):
+        jobs.enqueue(conn, 'bench_noop', {'i': i})
+    conn.commit()
+
+    procs = [multiprocessing.Process(target=_drain, args=(db,)) for _ in range(n_workers)]
+    started = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - started
+
+    done = conn.execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (jobs.DONE,)).fetchone()[0]
+    conn.close()
+    print(f"workers={n_workers:2d}  {done}/{n_jobs} done in {elapsed:6.2f}s  {done / elapsed:8.0f} jobs/s")
+
+
+def main():
+    args = parse_args()
+    for n in (int(x) for x in args.workers.split(',')):
+        bench(args.jobs, n)
+
+
+if __name__ == '__main__':
+    main()
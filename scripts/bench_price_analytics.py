@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark price_analytics.run() on a synthetic prices table.
+
+Usage:
+  python3 scripts/bench_price_analytics.py --rows 10000000 --stores 8 [--chunk-rows 1000000]
+
+Builds a temp database with ~rows/stores products, each listed in a random
+subset of stores around a base price, plus a few feed errors (price / 100),
+then runs the full analytics pass and prints wall time and peak RSS.
+"""
+
+import argparse
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import price_analytics
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Benchmark the vectorized price analytics')
+    p.add_argument('--rows', type=int, default=10_000_000)
+    p.add_argument('--stores', type=int, default=8)
+    p.add_argument('--chunk-rows', type=int, default=price_analytics.DEFAULT_CHUNK_ROWS)
+    p.add_argument('--seed', type=int, default=1)
+    return p.parse_args()
+
+
+def generate(conn, rows, stores, seed):
+    rnd = random.Random(seed)
+    conn.execute('CREATE TABLE stores (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.executemany('INSERT INTO stores VALUES (?, ?)', [(i, f'Store {i}') for i in range(1, stores + 1)])
+    conn.execute('CREATE TABLE prices (id INTEGER PRIMARY KEY, product_id INTEGER, store_id INTEGER, price INTEGER)')
+    # Store i is (i - 1)% more expensive than store 1 on average
+    markup = [1 + (i - 1) / 100 for i in range(stores + 1)]
+
+    def price_rows():
+        n = 0
+        pid = 0
+        while n < rows:
+            pid += 1
+            base = rnd.randrange(20_000, 1_500_000)
+            for store in rnd.sample(range(1, stores + 1), rnd.randint(2, stores)):
+                price = int(base * markup[store] * rnd.uniform(0.97, 1.03))
+                if rnd.random() < 0.0005:
+                    price //= 100
+                yield pid, store, price
+                n += 1
+
+    conn.executemany('INSERT INTO prices (product_id, store_id, price) VALUES (?, ?, ?)', price_rows())
+    conn.commit()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='kazprice-analytics-')
+    try:
+        conn = sqlite3.connect(os.path.join(workdir, 'bench.db'))
+        t0 = time.perf_counter()
+        generate(conn, args.rows, args.stores, args.seed)
+        price_analytics.ensure_schema(conn)
+        print(f"generated {args.rows} price rows + index in {time.perf_counter() - t0:.1f}s")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report = price_analytics.run(conn, args.chunk_rows)
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print(f"analytics: {report['rows']} rows, {report['products']} products, {report['outliers']} outliers "
+              f"in {report['seconds']:.2f}s; peak RSS {rss_before / 1024:.0f} -> {rss_after / 1024:.0f} MB "
+              f"(chunk {args.chunk_rows} rows)")
+        for row in conn.execute('SELECT store_id, price_index, cheapest_count FROM store_price_index ORDER BY price_index'):
+            print('  store {}: index {:.3f}, cheapest for {} products'.format(*row))
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
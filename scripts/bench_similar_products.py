@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the similar products rebuild and incremental refresh.
+
+Usage:
+  python3 scripts/bench_similar_products.py --products 1000000 [--changed 100]
+
+Builds a temp database with synthetic phone/laptop catalogs (brand, series
+and edition tokens; several colors and storage sizes per model, prices in
+two stores), runs a full rebuild, then changes --changed products
+and runs the incremental refresh. Run it with growing --products to check
+that the rebuild time grows linearly.
+"""
+
+import argparse
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import similar_products
+
+BRANDS = ['Apple iPhone', 'Samsung Galaxy', 'Xiaomi Redmi', 'Xiaomi Poco', 'Honor', 'Huawei Nova',
+          'Google Pixel', 'OnePlus', 'Realme', 'Oppo Reno', 'Vivo', 'Motorola Moto', 'Asus Zenbook',
+          'Lenovo ThinkPad', 'HP Pavilion', 'Acer Swift', 'Apple MacBook', 'Nothing Phone', 'Tecno Spark', 'Infinix']
+EDITIONS = ['', 'Pro', 'Pro Max', 'Plus', 'Ultra', 'Lite', 'Mini', 'FE', 'Neo', 'Air', 'SE', 'Edge']
+COLORS = ['Черный', 'Белый', 'Синий', 'Зеленый', 'Оранжевый', 'Серебристый']
+STORAGE = ['64GB', '128GB', '256GB', '512GB', '1TB']
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Benchmark the similar products index')
+    p.add_argument('--products', type=int, default=1_000_000)
+    p.add_argument('--changed', type=int, default=100)
+    p.add_argument('--seed', type=int, default=1)
+    return p.parse_args()
+
+
+def generate(conn, n, rnd):
+    conn.execute('CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, color TEXT, storage TEXT, image_url TEXT)')
+    conn.execute('CREATE TABLE prices (id INTEGER PRIMARY KEY, product_id INTEGER, store_id INTEGER, price INTEGER)')
+
+    # The number of model series grows with the catalog, ~12 models per series
+    series = max(50, n // 1000)
+
+    def rows():
+        pid = 0
+        while pid < n:
+            brand = rnd.choice(BRANDS)
+            name = f"{brand} {rnd.choice('ABCDEFGHKMNSTXZ')}{rnd.randint(1, series)} {rnd.choice(EDITIONS)}".strip()
+            base = rnd.randrange(60_000, 1_200_000)
+            for s, storage in enumerate(rnd.sample(STORAGE, rnd.randint(1, 3))):
+                for color in rnd.sample(COLORS, rnd.randint(1, 4)):
+                    pid += 1
+                    yield pid, name, color, storage, int(base * (1 + 0.15 * s))
+
+    for pid, name, color, storage, price in rows():
+        conn.execute('INSERT INTO products VALUES (?, ?, ?, ?, NULL)', (pid, name, color, storage))
+        conn.execute('INSERT INTO prices (product_id, store_id, price) VALUES (?, 1, ?), (?, 2, ?)',
+                     (pid, price, pid, int(price * 1.02)))
+    conn.commit()
+
+
+def main():
+    args = parse_args()
+    rnd = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix='kazprice-similar-')
+    try:
+        conn = sqlite3.connect(os.path.join(workdir, 'bench.db'))
+        t0 = time.perf_counter()
+        generate(conn, args.products, rnd)
+        conn.execute('CREATE INDEX idx_prices_product ON prices (product_id)')
+        similar_products.ensure_schema(conn)
+        print(f"generated {args.products} products in {time.perf_counter() - t0:.1f}s")
+
+        r = similar_products.rebuild(conn)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"rebuild: {r['products']} products, {r['models']} models in {r['seconds']:.2f}s "
+              f"({r['seconds'] / max(r['products'], 1) * 1e6:.1f} µs/product), peak RSS {rss:.0f} MB")
+
+        ids = rnd.sample(range(1, args.products + 1), min(args.changed, args.products))
+        conn.executemany('UPDATE prices SET price = price * 2 WHERE product_id = ? AND store_id = 1',
+                         [(pid,) for pid in ids])
+        conn.commit()
+        r = similar_products.refresh(conn)
+        print(f"refresh: {r['products']} changed products -> {r['models']} models, "
+              f"{r['recomputed']} neighbour lists in {r['seconds']:.2f}s")
+
+        pid = ids[0]
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            similar_products.alternatives(conn, pid)
+        print(f"lookup: {(time.perf_counter() - t0) * 1000:.0f} µs per product page query")
+        name = conn.execute('SELECT name FROM products WHERE id = ?', (pid,)).fetchone()[0]
+        print(f"\nalternatives for #{pid} {name}:")
+        for row in similar_products.alternatives(conn, pid):
+            print('  #{} {} {} {} score={:.3f} price={}'.format(*row))
+        conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cold-start report: import time per module and first-request latency.
+
+Usage:
+  python3 scripts/bench_startup.py [--db kazprice.db] [--runs 5] [--top 15] [--cold] [--json]
+
+Options:
+  --runs N    Fresh interpreter starts to measure (median is reported)
+  --top N     How many modules to list by cumulative import time
+  --cold      Use an empty template bytecode cache (no compile_templates.py)
+  --json      Print one JSON object instead of the table, for tracking
+              regressions across commits
+
+Each run starts a new Python process with `-X importtime`, imports app.py,
+then issues the first and second GET for each path through the Flask test
+client, against a temp copy of the database.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/login', '/main']
+
+PROBE = '''
+import json, sys, time
+sys.path.insert(0, {repo!r})
+t0 = time.perf_counter()
+import app
+result = {{'import_ms': (time.perf_counter() - t0) * 1000, 'requests': {{}}}}
+client = app.app.test_client()
+for path in {paths!r}:
+    timings = []
+    for _ in range(2):
+        t = time.perf_counter()
+        client.get(path)
+        timings.append((time.perf_counter() - t) * 1000)
+    result['requests'][path] = {{'first_ms': timings[0], 'second_ms': timings[1]}}
+print(json.dumps(result))
+'''
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Report cold-start import time and first-request latency')
+    p.add_argument('--db', default=os.path.join(REPO, 'kazprice.db'), help='Path to sqlite database file')
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('--top', type=int, default=15)
+    p.add_argument('--cold', action='store_true', help='Start with an empty template bytecode cache')
+    p.add_argument('--json', action='store_true', help='Print JSON')
+    return p.parse_args()
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once(workdir, env):
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', PROBE.format(repo=REPO, paths=PATHS)],
+                          cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix='kazprice-startup-')
+    try:
+        shutil.copy2(args.db, os.path.join(workdir, 'kazprice.db'))
+        env = dict(os.environ)
+        if args.cold:
+            env['KAZPRICE_JINJA_CACHE'] = os.path.join(workdir, 'jinja_cache')
+
+        runs = []
+        for _ in range(args.runs):
+            if args.cold:
+                shutil.rmtree(env['KAZPRICE_JINJA_CACHE'], ignore_errors=True)
+            runs.append(run_once(workdir, env))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'cold_template_cache': args.cold,
+        'runs': args.runs,
+        'import_ms': statistics.median(r['import_ms'] for r, _ in runs),
+        'requests': {
+            path: {k: statistics.median(r['requests'][path][k] for r, _ in runs) for k in ('first_ms', 'second_ms')}
+            for path in PATHS
+        },
+    }
+    modules = {}
+    for _, mods in runs:
+        for name, (self_us, cum_us) in mods.items():
+            modules.setdefault(name, []).append((self_us, cum_us))
+    ranked = sorted(((name, statistics.median(c for _, c in v) / 1000, statistics.median(s for s, _ in v) / 1000)
+                     for name, v in modules.items()), key=lambda m: m[1], reverse=True)
+    report['modules'] = [{'module': n, 'cumulative_ms': c, 'self_ms': s} for n, c, s in ranked[:args.top]]
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False))
+        return 0
+
+    print(f"import app: {report['import_ms']:.1f} ms (median of {args.runs}, "
+          f"{'cold' if args.cold else 'warm'} template cache)")
+    for path, t in report['requests'].items():
+        print(f"GET {path:8s} first {t['first_ms']:7.1f} ms   second {t['second_ms']:6.1f} ms")
+    print('\nslowest imports (cumulative / self, ms):')
+    for m in report['modules']:
+        print(f"  {m['cumulative_ms']:7.1f} {m['self_ms']:7.1f}  {m['module']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Count the database queries of one logged-in checkout flow.
+
+Usage:
+  python3 scripts/bench_user_context.py --db kazprice.db [--rounds 3] [--verbose]
+
+Options:
+  --db PATH      Database to copy (the copy is used and thrown away)
+  --rounds N     How many times to run the flow with the same app process
+  --verbose      Print every users/bank_cards statement
+
+Behavior:
+- Adds a user with a funded bank card to the copy, then runs
+  login -> profile -> checkout -> payment -> process_payment -> profile
+  through the Flask test client.
+- Every connection from app.get_db_connection() gets a trace callback.
+  Statements are counted per request: all statements, and the ones that
+  touch users or bank_cards.
+- Rate limits are reset between rounds so only the flow itself is measured.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+USER_TABLES = re.compile(r'\b(users|bank_cards)\b', re.I)
+TRANSACTION = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE)\b', re.I)
+EMAIL, PASSWORD = 'bench@kazprice.kz', 'bench-password'
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Count DB queries per checkout flow')
+    p.add_argument('--db', default=os.path.join(REPO, 'kazprice.db'), help='Path to sqlite database file')
+    p.add_argument('--rounds', type=int, default=3)
+    p.add_argument('--verbose', action='store_true')
+    return p.parse_args()
+
+
+def seed(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('INSERT INTO users (name, email, password_hash, address) VALUES (?, ?, ?, ?)',
+                 ('Bench', EMAIL, hashlib.sha256(PASSWORD.encode()).hexdigest(), 'Алматы'))
+    user_id = conn.execute('SELECT id FROM users WHERE email = ?', (EMAIL,)).fetchone()[0]
+    conn.execute('INSERT INTO bank_cards (user_id, card_name, card_number, balance) VALUES (?, ?, ?, ?)',
+                 (user_id, 'Kaspi Gold', '**** 4242', 10 ** 12))
+    card_id = conn.execute('SELECT id FROM bank_cards WHERE user_id = ?', (user_id,)).fetchone()[0]
+    product_id = conn.execute('SELECT product_id FROM prices WHERE price IS NOT NULL LIMIT 1').fetchone()[0]
+    conn.commit()
+    conn.close()
+    return card_id, product_id
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Database not found: {args.db}")
+        return 1
+    workdir = tempfile.mkdtemp(prefix='kazprice-userctx-')
+    try:
+        shutil.copy(args.db, os.path.join(workdir, 'kazprice.db'))
+        # app.py opens "kazprice.db" relative to the working directory
+        os.chdir(workdir)
+        card_id, product_id = seed('kazprice.db')
+        import app as kazprice
+
+        statements = []
+        connect = kazprice.get_db_connection
+
+        def traced_connection():
+            conn = connect()
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        kazprice.get_db_connection = traced_connection
+
+        def step(client, label, method, path, **kwargs):
+            del statements[:]
+            resp = getattr(client, method)(path, **kwargs)
+            queries = [s for s in statements if not TRANSACTION.match(s)]
+            user_queries = [s for s in queries if USER_TABLES.search(s)]
+            print(f"  {label:28s} {resp.status_code}  queries={len(queries):2d}  users/bank_cards={len(user_queries)}")
+            if args.verbose:
+                for s in user_queries:
+                    print('      ' + ' '.join(s.split())[:110])
+            return len(queries), len(user_queries)
+
+        for round_no in range(1, args.rounds + 1):
+            kazprice.app.extensions['rate_limit'].reset()
+            print(f"round {round_no}:")
+            totals = [0, 0]
+            with kazprice.app.test_client() as c:
+                flow = [
+                    ('POST /login', 'post', '/login', {'data': {'email': EMAIL, 'password': PASSWORD}}),
+                    ('GET /profile', 'get', '/profile', {}),
+                    ('GET /checkout', 'get', '/checkout', {}),
+                    ('GET /payment', 'get', '/payment', {}),
+                    ('POST /process_payment', 'post', '/process_payment', {'json': {'card_id': card_id}}),
+                    ('GET /profile (after)', 'get', '/profile', {}),
+                ]
+                for label, method, path, kwargs in flow:
+                    if label == 'GET /checkout':
+                        with c.session_transaction() as sess:
+                            sess['cart'] = {str(product_id): 1}
+                    n, n_user = step(c, label, method, path, **kwargs)
+                    totals[0] += n
+                    totals[1] += n_user
+            print(f"  {'total':28s}      queries={totals[0]:2d}  users/bank_cards={totals[1]}")
+    finally:
+        os.chdir(REPO)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
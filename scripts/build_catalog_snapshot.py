@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Build the memory-mapped catalog snapshot read by the app workers (catalog_snapshot.py).
+
+Usage:
+  python3 scripts/build_catalog_snapshot.py --db kazprice.db --out catalog.snap
+  python3 scripts/build_catalog_snapshot.py --db kazprice.db --out catalog.snap --watch 5
+
+Options:
+  --db PATH      Path to SQLite database file (default: kazprice.db)
+  --out PATH     Snapshot file (default: KAZPRICE_CATALOG_SNAPSHOT or catalog.snap)
+  --watch SEC    Keep running; rebuild whenever catalog_meta.version changes
+
+Behavior:
+- The snapshot is written to a temp file and renamed over --out, so workers
+  never see a partial file; each worker maps the new file on its next request.
+- Workers only use a snapshot whose catalog version matches the database,
+  otherwise they fall back to SQL, so a late rebuild never serves stale prices.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog_snapshot import build_snapshot
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Build the mmap catalog snapshot')
+    p.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+    p.add_argument('--out', default=os.environ.get('KAZPRICE_CATALOG_SNAPSHOT', 'catalog.snap'))
+    p.add_argument('--watch', type=float, help='Poll interval in seconds; rebuild on catalog changes')
+    return p.parse_args()
+
+
+def current_version(conn):
+    try:
+        return conn.execute('SELECT version FROM catalog_meta WHERE id = 1').fetchone()[0]
+    except (sqlite3.OperationalError, TypeError):
+        return None
+
+
+def build(conn, out):
+    started = time.perf_counter()
+    count, version = build_snapshot(conn, out)
+    print(f"Snapshot {out}: {count} products, catalog version {version} ({time.perf_counter() - started:.2f}s)")
+    return version
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Database not found: {args.db}")
+        return 1
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        built = build(conn, args.out)
+        while args.watch:
+            time.sleep(args.watch)
+            if current_version(conn) != built:
+                built = build(conn, args.out)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
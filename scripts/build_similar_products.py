@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Build the "similar products" tables read by the product page (similar_products.py).
+
+Usage:
+  python3 scripts/build_similar_products.py --db kazprice.db
+  python3 scripts/build_similar_products.py --db kazprice.db --changed
+  python3 scripts/build_similar_products.py --db kazprice.db --changed --watch 30
+
+Options:
+  --db PATH      Path to SQLite database file (default: kazprice.db)
+  --top-k N      Neighbours stored per product (default: 6)
+  --changed      Only recompute what the products in similarity_dirty affect
+  --watch SEC    Keep running; refresh changed products every SEC seconds
+
+Behavior:
+- A full rebuild writes product_models_new / similar_products_new and
+  renames them in, so the product page never sees a half-built table.
+- --changed on a database that was never fully built does a full rebuild.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import similar_products
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Build the similar products index')
+    p.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+    p.add_argument('--top-k', type=int, default=similar_products.TOP_K)
+    p.add_argument('--changed', action='store_true', help='Incremental refresh of dirty products')
+    p.add_argument('--watch', type=float, help='Poll interval in seconds for --changed')
+    return p.parse_args()
+
+
+def is_built(conn):
+    return conn.execute('SELECT EXISTS (SELECT 1 FROM product_models)').fetchone()[0]
+
+
+def report(kind, r):
+    print(f"{kind}: {r['products']} products, {r['models']} models, "
+          f"{r['recomputed']} neighbour lists in {r['seconds']:.2f}s")
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Database not found: {args.db}")
+        return 1
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        similar_products.ensure_schema(conn)
+        if not args.changed or not is_built(conn):
+            report('rebuild', similar_products.rebuild(conn, args.top_k))
+        else:
+            report('refresh', similar_products.refresh(conn, args.top_k))
+        while args.watch:
+            time.sleep(args.watch)
+            r = similar_products.refresh(conn, args.top_k)
+            if r['products']:
+                report('refresh', r)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Precompile all Jinja templates into the on-disk bytecode cache (jinja_cache.py).
+
+Usage:
+  python3 scripts/compile_templates.py [--cache-dir .jinja_cache] [--clear] [--force]
+  python3 scripts/compile_templates.py --check
+
+Run it after changing templates and commit .jinja_cache (Vercel has no
+build step for app.py), so cold starts load compiled templates instead of
+compiling base.html / navbar.html / footer.html and the page template on the
+first request. The cache is tied to the Python and Jinja versions: the
+script refuses to run on a Python other than the one in .python-version
+(the deployment runtime) unless --force is given. --check only reports
+templates whose cache entry is missing or stale and exits 1 if there are any.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Compile templates into the Jinja bytecode cache')
+    p.add_argument('--cache-dir', help='Cache directory (default: KAZPRICE_JINJA_CACHE or .jinja_cache)')
+    p.add_argument('--clear', action='store_true', help='Remove existing cache entries first')
+    p.add_argument('--force', action='store_true', help='Compile even on a Python other than .python-version')
+    p.add_argument('--check', action='store_true', help='Only list missing or stale entries (exit 1 if any)')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.cache_dir:
+        os.environ['KAZPRICE_JINJA_CACHE'] = os.path.abspath(args.cache_dir)
+
+    # Importing app migrates its database; only its Jinja environment is needed here
+    scratch = tempfile.mkdtemp(prefix='kazprice-templates-')
+    os.environ['KAZPRICE_DB'] = os.path.join(scratch, 'kazprice.db')
+    try:
+        import jinja_cache
+        from app import app
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    pinned = jinja_cache.pinned_python()
+    if args.check:
+        stale = jinja_cache.stale_templates(app.jinja_env, args.cache_dir or jinja_cache.DEFAULT_CACHE_DIR)
+        for name in stale:
+            print('Stale or missing:', name)
+        print(f"{len(stale)} stale template(s) for Python {'.'.join(map(str, pinned or sys.version_info[:2]))}")
+        return 1 if stale else 0
+    if pinned and tuple(sys.version_info[:2]) != pinned and not args.force:
+        print(f"This is Python {sys.version_info[0]}.{sys.version_info[1]} but the deployment runs "
+              f"{pinned[0]}.{pinned[1]} (.python-version); its cache entries would never load. Use --force to build anyway.")
+        return 2
+
+    bcc = app.jinja_env.bytecode_cache
+    if bcc is None:
+        print('Bytecode cache is disabled (KAZPRICE_JINJA_CACHE=off) or not writable.')
+        return 1
+    if args.clear:
+        bcc.clear()
+
+    started = time.perf_counter()
+    names = jinja_cache.compile_templates(app.jinja_env)
+    print(f"Compiled {len(names)} templates into {bcc.directory} in {time.perf_counter() - started:.2f}s "
+          f"(Python {sys.version_info[0]}.{sys.version_info[1]})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Online backup / snapshot tool for the KazPrice SQLite database.
+
+Usage:
+  python3 scripts/db_backup.py backup   --db kazprice.db [--dest backups] [--compact] [--gzip] [--keep 7] [--max-age-days 30]
+  python3 scripts/db_backup.py backup   --db kazprice.db --enable-wal
+  python3 scripts/db_backup.py verify   PATH
+  python3 scripts/db_backup.py restore  PATH --db kazprice.db
+  python3 scripts/db_backup.py prune    --db kazprice.db [--dest backups] [--keep 7] [--max-age-days 30]
+  python3 scripts/db_backup.py list     --db kazprice.db [--dest backups]
+
+Behavior:
+- Live backups need the database in WAL mode (app.py switches it on
+  startup). In the default rollback-journal mode every commit from another
+  connection restarts the backup API, and `VACUUM INTO` holds a shared lock
+  that blocks all writers until the copy is done, so `backup` refuses a
+  non-WAL database. `--enable-wal` switches it first; `--allow-non-wal` is
+  only for a database nobody is writing to.
+- `backup` copies the live database with the SQLite online backup API
+  (`sqlite3.Connection.backup`) in small page batches, sleeping between
+  batches. The copy runs inside one WAL read transaction, so concurrent
+  writes neither restart it nor wait for it.
+- `--compact` takes the snapshot with `VACUUM INTO` instead: free pages
+  dropped, result is defragmented. It is one read transaction for the
+  whole copy: in WAL mode writers keep committing, but checkpoints cannot
+  move past that snapshot, so the -wal file grows until it finishes.
+- `--gzip` compresses the finished snapshot (`.gz`), streaming in chunks.
+- `--keep` / `--max-age-days` apply the retention policy after a backup
+  (or on their own with `prune`). The newest backup is never removed.
+- `verify` runs `PRAGMA integrity_check` on a backup (plain or .gz).
+- `restore` verifies a backup and then writes it into the target database
+  through the backup API, so open connections see a consistent database.
+
+Backups are named `<db name>.bak.<YYYYmmdd_HHMMSS>[.gz]`, same as the ones
+made by scripts/migrate_add_user_cols.py.
+"""
+
+import argparse
+import datetime
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Pages copied per backup step. With the default 4 KiB page size this is
+# 4 MiB per step; the lock is held only while a step runs.
+DEFAULT_PAGES = 1024
+# Pause between steps, gives writers a window to take the lock.
+DEFAULT_STEP_SLEEP = 0.01
+BACKUP_INFIX = '.bak.'
+GZIP_CHUNK = 1024 * 1024
+
+
+class JournalModeError(RuntimeError):
+    """The database is not in WAL mode, so a live backup would block or starve writers."""
+
+
+def _timestamp():
+    return datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+
+
+def backup_path(db_path, dest_dir=None, compress=False):
+    """Build a timestamped backup path next to the database (or in dest_dir)."""
+    dest_dir = dest_dir or os.path.dirname(os.path.abspath(db_path))
+    name = os.path.basename(db_path) + BACKUP_INFIX + _timestamp()
+    if compress:
+        name += '.gz'
+    return os.path.join(dest_dir, name)
+
+
+def journal_mode(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('PRAGMA journal_mode').fetchone()[0].lower()
+    finally:
+        conn.close()
+
+
+def enable_wal(db_path):
+    """Switch the database to WAL (persistent). Returns the resulting journal mode."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        return conn.execute('PRAGMA journal_mode=WAL').fetchone()[0].lower()
+    finally:
+        conn.close()
+
+
+def online_backup(db_path, dest, pages=DEFAULT_PAGES, step_sleep=DEFAULT_STEP_SLEEP):
+    """Copy a live database to `dest` with the paged online backup API.
+
+    Between steps of `pages` pages we sleep `step_sleep` seconds. In WAL
+    mode the whole copy reads one snapshot and writers are never blocked;
+    in rollback-journal mode any write restarts the copy (make_backup
+    refuses that case).
+    """
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(dest)
+
+    def _throttle(status, remaining, total):
+        if remaining and step_sleep:
+            time.sleep(step_sleep)
+
+    try:
+        # In WAL mode an open read transaction pins the snapshot, so writes
+        # from other connections don't force the backup to start over.
+        wal = src.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal'
+        if wal:
+            src.execute('BEGIN')
+            src.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        src.backup(dst, pages=pages, progress=_throttle)
+        if wal:
+            src.rollback()
+    finally:
+        dst.close()
+        src.close()
+    return dest
+
+
+def compact_snapshot(db_path, dest):
+    """Write a defragmented copy with `VACUUM INTO` (SQLite >= 3.27)."""
+    if os.path.exists(dest):
+        raise FileExistsError(dest)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('VACUUM INTO ?', (dest,))
+    finally:
+        conn.close()
+    return dest
+
+
+def gzip_file(path, remove_source=True):
+    """Compress `path` into `path + '.gz'` in fixed-size chunks."""
+    out = path + '.gz'
+    with open(path, 'rb') as f_in, gzip.open(out, 'wb', compresslevel=6) as f_out:
+        shutil.copyfileobj(f_in, f_out, GZIP_CHUNK)
+    shutil.copystat(path, out)
+    if remove_source:
+        os.remove(path)
+    return out
+
+
+def _open_plain(path):
+    """Return (plain_path, is_temp). Decompresses .gz backups to a temp file."""
+    if not path.endswith('.gz'):
+        return path, False
+    fd, tmp = tempfile.mkstemp(suffix='.db')
+    with os.fdopen(fd, 'wb') as f_out, gzip.open(path, 'rb') as f_in:
+        shutil.copyfileobj(f_in, f_out, GZIP_CHUNK)
+    return tmp, True
+
+
+def integrity_check(path):
+    """Run `PRAGMA integrity_check` and return the list of problems (empty if ok)."""
+    plain, is_temp = _open_plain(path)
+    try:
+        conn = sqlite3.connect('file:{}?mode=ro'.format(plain), uri=True)
+        try:
+            rows = [r[0] for r in conn.execute('PRAGMA integrity_check').fetchall()]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        rows = [str(e)]
+    finally:
+        if is_temp:
+            os.remove(plain)
+    return [] if rows == ['ok'] else rows
+
+
+def make_backup(db_path, dest_dir=None, compact=False, compress=False,
+                pages=DEFAULT_PAGES, step_sleep=DEFAULT_STEP_SLEEP, require_wal=True):
+    """Take one backup of `db_path` and return the path of the result.
+
+    Raises JournalModeError for a non-WAL database unless `require_wal` is
+    False (only safe when nothing writes to it during the backup).
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+    mode = journal_mode(db_path)
+    if require_wal and mode != 'wal':
+        raise JournalModeError(
+            f'{db_path} is in {mode!r} journal mode; a live backup would be restarted by every write '
+            '(or block writers with --compact). Switch it to WAL with --enable-wal.')
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+    dest = backup_path(db_path, dest_dir)
+    # Write to a temp name first so a half-written file never looks like a backup
+    tmp = dest + '.part'
+    if compact:
+        compact_snapshot(db_path, tmp)
+    else:
+        online_backup(db_path, tmp, pages=pages, step_sleep=step_sleep)
+    os.replace(tmp, dest)
+    if compress:
+        dest = gzip_file(dest)
+    return dest
+
+
+def list_backups(db_path, dest_dir=None):
+    """Return existing backups for `db_path`, newest first."""
+    dest_dir = dest_dir or os.path.dirname(os.path.abspath(db_path))
+    prefix = os.path.basename(db_path) + BACKUP_INFIX
+    if not os.path.isdir(dest_dir):
+        return []
+    found = [os.path.join(dest_dir, n) for n in os.listdir(dest_dir)
+             if n.startswith(prefix) and not n.endswith('.part')]
+    # Timestamp in the name sorts lexically; mtime breaks ties
+    found.sort(key=lambda p: (os.path.basename(p)[len(prefix):].split('.')[0], os.path.getmtime(p)), reverse=True)
+    return found
+
+
+def prune_backups(db_path, dest_dir=None, keep=None, max_age_days=None, now=None):
+    """Apply the retention policy and return the list of removed files.
+
+    `keep` keeps at most that many newest backups, `max_age_days` drops
+    backups older than that. The newest backup always survives.
+    """
+    backups = list_backups(db_path, dest_dir)
+    now = now or time.time()
+    removed = []
+    for i, path in enumerate(backups):
+        if i == 0:
+            continue
+        too_many = keep is not None and i >= keep
+        too_old = max_age_days is not None and now - os.path.getmtime(path) > max_age_days * 86400
+        if too_many or too_old:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def restore_backup(backup, db_path, pages=DEFAULT_PAGES):
+    """Verify `backup` and copy it over `db_path` using the backup API."""
+    problems = integrity_check(backup)
+    if problems:
+        raise sqlite3.DatabaseError('backup failed integrity check: ' + '; '.join(problems[:5]))
+    plain, is_temp = _open_plain(backup)
+    try:
+        src = sqlite3.connect('file:{}?mode=ro'.format(plain), uri=True)
+        dst = sqlite3.connect(db_path)
+        try:
+            src.backup(dst, pages=pages)
+        finally:
+            dst.close()
+            src.close()
+    finally:
+        if is_temp:
+            os.remove(plain)
+    return db_path
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Online backup, snapshot and restore for the KazPrice database')
+    sub = p.add_subparsers(dest='command', required=True)
+
+    def retention(sp):
+        sp.add_argument('--keep', type=int, help='Keep at most N newest backups')
+        sp.add_argument('--max-age-days', type=float, help='Remove backups older than N days')
+
+    b = sub.add_parser('backup', help='Take a backup of the live database')
+    b.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+    b.add_argument('--dest', help='Directory for backups (default: next to the database)')
+    b.add_argument('--compact', action='store_true', help='Use VACUUM INTO for a compacted snapshot')
+    b.add_argument('--gzip', action='store_true', help='Compress the backup with gzip')
+    b.add_argument('--pages', type=int, default=DEFAULT_PAGES, help='Pages copied per backup step')
+    b.add_argument('--sleep', type=float, default=DEFAULT_STEP_SLEEP, help='Seconds to sleep between steps')
+    b.add_argument('--enable-wal', action='store_true', help='Switch the database to WAL mode before the backup')
+    b.add_argument('--allow-non-wal', action='store_true',
+                   help='Back up a non-WAL database anyway (only when nothing is writing to it)')
+    retention(b)
+
+    v = sub.add_parser('verify', help='Run PRAGMA integrity_check on a backup')
+    v.add_argument('path')
+
+    r = sub.add_parser('restore', help='Verify a backup and restore it into the database')
+    r.add_argument('path')
+    r.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+
+    pr = sub.add_parser('prune', help='Apply the retention policy')
+    pr.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+    pr.add_argument('--dest', help='Directory for backups (default: next to the database)')
+    retention(pr)
+
+    ls = sub.add_parser('list', help='List existing backups, newest first')
+    ls.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+    ls.add_argument('--dest', help='Directory for backups (default: next to the database)')
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == 'backup':
+        if not os.path.exists(args.db):
+            print(f"Database file not found: {args.db}")
+            return 1
+        if args.enable_wal:
+            print(f"Journal mode: {enable_wal(args.db)}")
+        started = time.time()
+        try:
+            dest = make_backup(args.db, args.dest, compact=args.compact, compress=args.gzip,
+                               pages=args.pages, step_sleep=args.sleep, require_wal=not args.allow_non_wal)
+        except JournalModeError as e:
+            print('Backup refused:', e)
+            return 4
+        print(f"Backup created: {dest} ({time.time() - started:.2f}s)")
+        if args.keep is not None or args.max_age_days is not None:
+            for path in prune_backups(args.db, args.dest, args.keep, args.max_age_days):
+                print(f"Removed old backup: {path}")
+        return 0
+
+    if args.command == 'verify':
+        problems = integrity_check(args.path)
+        if problems:
+            print('Integrity check FAILED:')
+            for line in problems:
+                print('  ' + line)
+            return 2
+        print(f"Integrity check ok: {args.path}")
+        return 0
+
+    if args.command == 'restore':
+        try:
+            restore_backup(args.path, args.db)
+        except (sqlite3.DatabaseError, OSError) as e:
+            print('Restore failed:', e)
+            return 3
+        print(f"Restored {args.path} -> {args.db}")
+        return 0
+
+    if args.command == 'prune':
+        removed = prune_backups(args.db, args.dest, args.keep, args.max_age_days)
+        for path in removed:
+            print(f"Removed old backup: {path}")
+        print(f"{len(removed)} backup(s) removed")
+        return 0
+
+    if args.command == 'list':
+        for path in list_backups(args.db, args.dest):
+            print(f"{path}\t{os.path.getsize(path)} bytes")
+        return 0
+
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Job queue worker and inspection CLI (see jobs.py).
+
+Usage:
+  python3 scripts/job_queue.py work   --db kazprice.db [-n 4] [--poll 0.5] [--once]
+  python3 scripts/job_queue.py status --db kazprice.db
+  python3 scripts/job_queue.py dead   --db kazprice.db [--limit 20]
+  python3 scripts/job_queue.py retry  --db kazprice.db [JOB_ID ...]
+  python3 scripts/job_queue.py requeue-stale --db kazprice.db
+
+Behavior:
+- Creates the jobs / order_items tables in --db if they are missing.
+- `work` starts N worker processes that claim and run jobs until Ctrl+C.
+  With --once each worker exits when the queue is empty.
+- `status` prints queue depth per status and job kind.
+- `dead` lists dead-letter jobs with their last error.
+- `retry` moves dead-letter jobs (all, or the given ids) back to the queue.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jobs
+import job_handlers
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='KazPrice background job queue')
+    sub = p.add_subparsers(dest='command', required=True)
+
+    w = sub.add_parser('work', help='Run worker processes')
+    w.add_argument('-n', '--workers', type=int, default=1, help='Number of worker processes')
+    w.add_argument('--poll', type=float, default=0.5, help='Seconds to sleep when the queue is empty')
+    w.add_argument('--once', action='store_true', help='Exit when the queue is empty')
+
+    sub.add_parser('status', help='Show queue depth')
+    d = sub.add_parser('dead', help='List dead-letter jobs')
+    d.add_argument('--limit', type=int, default=20)
+    r = sub.add_parser('retry', help='Requeue dead-letter jobs')
+    r.add_argument('ids', nargs='*', type=int)
+    sub.add_parser('requeue-stale', help='Requeue jobs of crashed workers')
+
+    for sp in sub.choices.values():
+        sp.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+    return p.parse_args()
+
+
+def _worker(db, poll, once):
+    try:
+        jobs.work(db, poll_interval=poll, stop_when_empty=once)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Database not found: {args.db}")
+        return 1
+    conn = jobs.connect(args.db)
+    try:
+        job_handlers.ensure_schema(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+    if args.command == 'work':
+        procs = [multiprocessing.Process(target=_worker, args=(args.db, args.poll, args.once))
+                 for _ in range(args.workers)]
+        for proc in procs:
+            proc.start()
+        print(f"Started {len(procs)} worker(s) on {args.db}")
+        try:
+            for proc in procs:
+                proc.join()
+        except KeyboardInterrupt:
+            for proc in procs:
+                proc.join()
+        return 0
+
+    conn = jobs.connect(args.db)
+    try:
+        if args.command == 'status':
+            depth = jobs.queue_depth(conn)
+            if not depth:
+                print('Queue is empty.')
+            for status in (jobs.QUEUED, jobs.RUNNING, jobs.DONE, jobs.DEAD):
+                kinds = depth.get(status, {})
+                if kinds:
+                    detail = ', '.join(f"{k}={n}" for k, n in sorted(kinds.items()))
+                    print(f"{status:8s} {sum(kinds.values()):8d}   {detail}")
+        elif args.command == 'dead':
+            rows = conn.execute('SELECT id, kind, attempts, last_error FROM jobs WHERE status = ? ORDER BY id DESC LIMIT ?',
+                                (jobs.DEAD, args.limit)).fetchall()
+            for row in rows:
+                last_line = (row['last_error'] or '').strip().splitlines()[-1:] or ['']
+                print(f"#{row['id']} {row['kind']} attempts={row['attempts']}: {last_line[0]}")
+            if not rows:
+                print('No dead-letter jobs.')
+        elif args.command == 'retry':
+            print(f"Requeued {jobs.retry_dead(conn, args.ids)} job(s)")
+        elif args.command == 'requeue-stale':
+            print(f"Requeued or dead-lettered {jobs.requeue_stale(conn)} stale job(s)")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,11 +3,14 @@
 Migration helper: ensure `users` table has `phone` and `address` columns.
 
 Usage:
-  python3 scripts/migrate_add_user_cols.py --db kazprice.db --backup
+  python3 scripts/migrate_add_user_cols.py --db kazprice.db --backup [--enable-wal]
 
 Options:
   --db PATH      Path to SQLite database file (default: kazprice.db)
-  --backup       Make a timestamped backup copy before applying changes
+  --backup       Make a timestamped online backup before applying changes
+                 (uses the SQLite backup API, see scripts/db_backup.py)
+  --enable-wal   Switch the database to WAL mode before the backup; a live
+                 backup of a non-WAL database is refused
 
 Behavior:
 - If the `users` table does not exist, the script exits with a message.
@@ -19,25 +22,31 @@ Behavior:
 import argparse
 import os
 import sqlite3
-import shutil
-import datetime
 import sys
 
+from db_backup import JournalModeError, enable_wal, make_backup
+
 
 def parse_args():
     p = argparse.ArgumentParser(description='Ensure users table has phone and address columns')
     p.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
     p.add_argument('--backup', action='store_true', help='Create a backup copy before migrating')
+    p.add_argument('--enable-wal', action='store_true', help='Switch the database to WAL mode before the backup')
     return p.parse_args()
 
 
-def backup_db(db_path):
+def backup_db(db_path, wal=False):
     if not os.path.exists(db_path):
         print(f"Database file not found: {db_path}")
         return None
-    ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    dest = f"{db_path}.bak.{ts}"
-    shutil.copy2(db_path, dest)
+    if wal:
+        print(f"Journal mode: {enable_wal(db_path)}")
+    # Paged copy through the backup API; only safe next to writers in WAL mode
+    try:
+        dest = make_backup(db_path)
+    except JournalModeError as e:
+        print('Backup refused:', e)
+        return None
     print(f"Backup created: {dest}")
     return dest
 
@@ -96,7 +105,7 @@ def main():
     db = args.db
 
     if args.backup:
-        bk = backup_db(db)
+        bk = backup_db(db, wal=args.enable_wal)
         if not bk:
             print('Backup failed or skipped. Aborting migration.')
             sys.exit(1)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Run the vectorized price analytics (price_analytics.py) over the prices table.
+
+Usage:
+  python3 scripts/run_price_analytics.py --db kazprice.db [--chunk-rows 1000000] [--show 10]
+
+Writes store_price_index, product_price_stats and price_outliers, then
+prints the store ranking and the most extreme outliers. Needs numpy
+(pip install -r requirements-scripts.txt).
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import price_analytics
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description='Compute store price index and price outliers')
+    p.add_argument('--db', default='kazprice.db', help='Path to sqlite database file')
+    p.add_argument('--chunk-rows', type=int, default=price_analytics.DEFAULT_CHUNK_ROWS,
+                   help='Price rows per chunk (bounds memory use)')
+    p.add_argument('--show', type=int, default=10, help='How many outliers to print')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not os.path.exists(args.db):
+        print(f"Database not found: {args.db}")
+        return 1
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        report = price_analytics.run(conn, args.chunk_rows)
+        print(f"{report['rows']} prices, {report['products']} products, {report['outliers']} outliers "
+              f"in {report['seconds']:.2f}s")
+
+        print('\nStore price index (1.00 = median price, lower is cheaper):')
+        for name, index, products, cheapest, outliers in conn.execute('''
+            SELECT IFNULL(s.name, '#' || i.store_id), i.price_index, i.products, i.cheapest_count, i.outliers
+            FROM store_price_index i LEFT JOIN stores s ON s.id = i.store_id
+            ORDER BY i.price_index IS NULL, i.price_index
+        '''):
+            index_text = f"{index:.3f}" if index is not None else '  -  '
+            print(f"  {index_text}  {name:20s} products={products} cheapest={cheapest} outliers={outliers}")
+
+        rows = conn.execute('SELECT price_id, product_id, store_id, price, median_price, ratio FROM price_outliers '
+                            'ORDER BY ABS(LOG(ratio)) DESC LIMIT ?', (args.show,)).fetchall()
+        if rows:
+            print('\nMost suspicious prices:')
+        for price_id, product_id, store_id, price, median, ratio in rows:
+            print(f"  price #{price_id}: product {product_id} store {store_id} {price:,} ₸ "
+                  f"(median {median:,.0f} ₸, x{ratio:.3f})")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+Precomputed "similar products" for the product page.
+
+    python3 scripts/build_similar_products.py --db kazprice.db            # full rebuild
+    python3 scripts/build_similar_products.py --db kazprice.db --changed  # only dirty products
+
+- Variants: products whose names normalize to the same model key
+  ("Apple iPhone 17 Pro Max" in every color and storage) are grouped in
+  product_models; the product page reads a model's variants with one
+  indexed lookup on model_key.
+- Alternatives: top-k products of *other* models, stored in
+  similar_products (product_id, rank) -> similar_id, score. The score mixes
+  IDF-weighted cosine similarity of the model names with storage and price
+  band closeness.
+
+Candidate models come from an inverted index over name tokens instead of
+comparing all pairs: tokens shared by more than MAX_POSTING models
+("apple", "galaxy") are too common to find candidates with, so each model
+only walks short posting lists. Products of one model with the same
+storage and price band share a profile, and neighbours are computed once
+per profile, so the rebuild is linear in the number of products.
+
+Triggers on products and prices record changed product ids in
+similarity_dirty; refresh() recomputes only the models those products
+belong to (before and after the change), their candidate models and the
+models that currently list one of their products (index on similar_id).
+IDF weights drift a little between full rebuilds, which is fine for a
+ranking.
+"""
+
+import heapq
+import math
+import re
+import time
+
+TOP_K = 6
+MODEL_CANDIDATES = 20     # other models scored per profile
+MAX_POSTING = 200         # tokens in more models than this don't generate candidates
+PRICE_BAND_STEP = 1.25    # a band is a 25% price range
+PRICE_BAND_REACH = 4      # bands further apart than this score 0 on price
+W_NAME, W_STORAGE, W_PRICE = 0.6, 0.15, 0.25
+
+_STORAGE_RE = re.compile(r'(\d+)\s*(gb|tb|гб|тб)\b', re.I)
+_PARENS_RE = re.compile(r'\([^)]*\)')
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def model_key(name):
+    """Normalized model name: lower case, storage and (...) parts dropped, single spaces."""
+    text = (name or '').lower().replace('ё', 'е')
+    text = _STORAGE_RE.sub(' ', _PARENS_RE.sub(' ', text))
+    return ' '.join(_TOKEN_RE.findall(text))
+
+
+def storage_gb(storage):
+    """'256GB' -> 256, '1TB' -> 1024, None when unknown."""
+    m = _STORAGE_RE.search(storage or '')
+    if not m:
+        return None
+    size = int(m.group(1))
+    return size * 1024 if m.group(2).lower() in ('tb', 'тб') else size
+
+
+def price_band(price):
+    if not price or price <= 0:
+        return None
+    return int(math.log(price) / math.log(PRICE_BAND_STEP))
+
+
+def ensure_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS product_models (
+            product_id INTEGER PRIMARY KEY,
+            model_key TEXT NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_product_models_key ON product_models (model_key)')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS similar_products (
+            product_id INTEGER NOT NULL,
+            rank INTEGER NOT NULL,
+            similar_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (product_id, rank)
+        ) WITHOUT ROWID
+    ''')
+    # Who lists a product, for incremental refreshes
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_similar_products_similar ON similar_products (similar_id)')
+    # REPLACE gives a re-dirtied product a new rowid, so a refresh that
+    # started earlier does not clear it (see _dirty_mark)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS similarity_dirty (
+            product_id INTEGER NOT NULL UNIQUE
+        )
+    ''')
+    for table, column in (('products', 'id'), ('prices', 'product_id')):
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+            conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_similarity_dirty
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT OR REPLACE INTO similarity_dirty (product_id) VALUES ({row}.{column});
+                END
+            ''')
+    conn.commit()
+
+
+class ModelIndex:
+    """Inverted index from name tokens to model keys, with IDF weights."""
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.position = {k: i for i, k in enumerate(self.keys)}
+        self.token_sets = [frozenset(k.split()) for k in self.keys]
+        self.postings = {}
+        for i, tokens in enumerate(self.token_sets):
+            for t in tokens:
+                self.postings.setdefault(t, []).append(i)
+        n = len(self.keys)
+        self.weight = {t: math.log(1 + n / len(p)) ** 2 for t, p in self.postings.items()}
+        self.norms = [self._norm(tokens) for tokens in self.token_sets]
+
+    def _norm(self, tokens):
+        return math.sqrt(sum(self.weight.get(t, 0.0) for t in tokens)) or 1.0
+
+    def _walk(self, key):
+        """(own position, token set, {model position: shared rare-token weight}, common tokens)."""
+        tokens = frozenset(key.split())
+        own = self.position.get(key)
+        acc = {}
+        common = []
+        for t in sorted(tokens, key=lambda t: len(self.postings.get(t, ()))):
+            posting = self.postings.get(t)
+            if not posting:
+                continue
+            if len(posting) > MAX_POSTING and acc:
+                common.append(t)
+                continue
+            # The rarest token always gives candidates, even if it is common
+            w = self.weight[t]
+            for j in posting[:MAX_POSTING]:
+                if j != own:
+                    acc[j] = acc.get(j, 0.0) + w
+        return own, tokens, acc, common
+
+    def candidates(self, key, limit=MODEL_CANDIDATES):
+        """[(name similarity, model position)] for the `limit` most similar other models."""
+        own, tokens, acc, common = self._walk(key)
+        norm = self._norm(tokens)
+        sets, norms = self.token_sets, self.norms
+        scored = []
+        for j, w in acc.items():
+            for t in common:
+                if t in sets[j]:
+                    w += self.weight[t]
+            scored.append((w / (norm * norms[j]), j))
+        return heapq.nlargest(limit, scored)
+
+
+def build_profiles(rows):
+    """rows: (product_id, name, storage, best_price) -> {model_key: {(storage level, band): [product ids]}}.
+
+    The storage level is log2 of the size in GB. Product ids are ordered by
+    price, so the first id is the cheapest of the profile.
+    """
+    models = {}
+    for pid, name, storage, price in sorted(rows, key=lambda r: (r[3] is None, r[3] or 0, r[0])):
+        key = model_key(name)
+        if not key:
+            continue
+        gb = storage_gb(storage)
+        profile = (math.log2(gb) if gb else None, price_band(price))
+        models.setdefault(key, {}).setdefault(profile, []).append(pid)
+    return models
+
+
+def profile_neighbours(profile, candidates, index, models, k=TOP_K):
+    """Top-k (score, product id) for one profile: the best-matching product of each candidate model.
+
+    Storage scores 1 for the same size, 0.5 one doubling apart; price scores
+    1 in the same band, 0 PRICE_BAND_REACH bands apart.
+    """
+    level, band = profile
+    best = []
+    for name_sim, j in candidates:
+        other = models.get(index.keys[j])
+        if not other:
+            continue
+        top = None
+        for (olevel, oband), ids in other.items():
+            score = W_NAME * name_sim
+            if level is not None and olevel is not None:
+                score += W_STORAGE * max(0.0, 1.0 - abs(level - olevel) / 2)
+            if band is not None and oband is not None:
+                score += W_PRICE * max(0.0, 1.0 - abs(band - oband) / PRICE_BAND_REACH)
+            if top is None or score > top[0]:
+                top = (score, ids[0])
+        best.append(top)
+    return heapq.nlargest(k, best, key=lambda item: (item[0], -item[1]))
+
+
+def _neighbour_rows(keys, index, models, k):
+    """similar_products rows for every product of the models in `keys`."""
+    for key in keys:
+        profiles = models.get(key)
+        if not profiles:
+            continue
+        candidates = index.candidates(key)
+        for profile, ids in profiles.items():
+            neighbours = profile_neighbours(profile, candidates, index, models, k)
+            for pid in ids:
+                for rank, (score, similar_id) in enumerate(neighbours, 1):
+                    yield pid, rank, similar_id, round(score, 4)
+
+
+_FEATURES_SQL = '''
+    SELECT p.id, p.name, p.storage, MIN(pr.price)
+    FROM products p
+    LEFT JOIN prices pr ON pr.product_id = p.id
+    {where}
+    GROUP BY p.id
+'''
+
+
+def _chunks(values, size=500):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _features(conn, product_ids):
+    rows = []
+    for chunk in _chunks(product_ids):
+        where = 'WHERE p.id IN ({})'.format(','.join('?' * len(chunk)))
+        rows += conn.execute(_FEATURES_SQL.format(where=where), chunk).fetchall()
+    return [tuple(r) for r in rows]
+
+
+def _model_product_ids(conn, keys):
+    ids = []
+    for chunk in _chunks(keys):
+        ids += [r[0] for r in conn.execute(
+            'SELECT product_id FROM product_models WHERE model_key IN ({})'.format(','.join('?' * len(chunk))), chunk)]
+    return ids
+
+
+def _dirty_mark(conn):
+    return conn.execute('SELECT IFNULL(MAX(rowid), 0) FROM similarity_dirty').fetchone()[0]
+
+
+def rebuild(conn, k=TOP_K):
+    """Recompute product_models and similar_products for the whole catalog. Returns a report dict."""
+    started = time.perf_counter()
+    ensure_schema(conn)
+    mark = _dirty_mark(conn)
+    rows = [tuple(r) for r in conn.execute(_FEATURES_SQL.format(where=''))]
+    models = build_profiles(rows)
+    index = ModelIndex(models)
+
+    conn.execute('DROP TABLE IF EXISTS product_models_new')
+    conn.execute('CREATE TABLE product_models_new (product_id INTEGER PRIMARY KEY, model_key TEXT NOT NULL)')
+    # Rows come out grouped by model; insert them in key order so the
+    # B-trees are appended to instead of updated at random pages
+    conn.executemany('INSERT INTO product_models_new VALUES (?, ?)', sorted(
+        (pid, key) for key, profiles in models.items() for ids in profiles.values() for pid in ids))
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS similar_products_fill (product_id, rank, similar_id, score)')
+    conn.execute('DELETE FROM similar_products_fill')
+    conn.executemany('INSERT INTO similar_products_fill VALUES (?, ?, ?, ?)', _neighbour_rows(models, index, models, k))
+    conn.execute('DROP TABLE IF EXISTS similar_products_new')
+    conn.execute('''
+        CREATE TABLE similar_products_new (
+            product_id INTEGER NOT NULL, rank INTEGER NOT NULL, similar_id INTEGER NOT NULL, score REAL NOT NULL,
+            PRIMARY KEY (product_id, rank)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('INSERT INTO similar_products_new SELECT * FROM similar_products_fill ORDER BY product_id, rank')
+    conn.execute('DROP TABLE similar_products_fill')
+    conn.commit()
+
+    # Swap the new tables in with one short transaction
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.execute('DROP TABLE product_models')
+        conn.execute('ALTER TABLE product_models_new RENAME TO product_models')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_product_models_key ON product_models (model_key)')
+        conn.execute('DROP TABLE similar_products')
+        conn.execute('ALTER TABLE similar_products_new RENAME TO similar_products')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_similar_products_similar ON similar_products (similar_id)')
+        conn.execute('DELETE FROM similarity_dirty WHERE rowid <= ?', (mark,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {'products': len(rows), 'models': len(models), 'recomputed': len(rows),
+            'seconds': time.perf_counter() - started}
+
+
+def refresh(conn, k=TOP_K):
+    """Recompute the neighbours affected by the products in similarity_dirty. Returns a report dict."""
+    started = time.perf_counter()
+    ensure_schema(conn)
+    mark = _dirty_mark(conn)
+    dirty = [r[0] for r in conn.execute('SELECT product_id FROM similarity_dirty WHERE rowid <= ?', (mark,))]
+    if not dirty:
+        return {'products': 0, 'models': 0, 'recomputed': 0, 'seconds': time.perf_counter() - started}
+
+    old_keys = set()
+    for chunk in _chunks(dirty):
+        old_keys.update(r[0] for r in conn.execute(
+            'SELECT model_key FROM product_models WHERE product_id IN ({})'.format(','.join('?' * len(chunk))), chunk))
+    changed = build_profiles(_features(conn, dirty))
+    for chunk in _chunks(dirty):
+        conn.execute('DELETE FROM product_models WHERE product_id IN ({})'.format(','.join('?' * len(chunk))), chunk)
+    conn.executemany('INSERT INTO product_models VALUES (?, ?)',
+                     ((pid, key) for key, profiles in changed.items() for ids in profiles.values() for pid in ids))
+
+    index = ModelIndex(r[0] for r in conn.execute('SELECT DISTINCT model_key FROM product_models'))
+    # Models whose lists can change: the changed ones, the models they are
+    # similar to and the models that list one of their products now
+    affected = old_keys | set(changed)
+    touched = set(affected)
+    for key in affected:
+        touched.update(index.keys[j] for _, j in index.candidates(key))
+    listed = set(dirty) | set(_model_product_ids(conn, affected))
+    for chunk in _chunks(listed):
+        touched.update(r[0] for r in conn.execute('''
+            SELECT DISTINCT m.model_key FROM similar_products s
+            JOIN product_models m ON m.product_id = s.product_id
+            WHERE s.similar_id IN ({})
+        '''.format(','.join('?' * len(chunk))), chunk))
+    needed = set(touched)
+    for key in touched:
+        needed.update(index.keys[j] for _, j in index.candidates(key))
+    models = build_profiles(_features(conn, _model_product_ids(conn, needed)))
+
+    recompute = set(dirty) | set(_model_product_ids(conn, touched))
+    for chunk in _chunks(recompute):
+        conn.execute('DELETE FROM similar_products WHERE product_id IN ({})'.format(','.join('?' * len(chunk))), chunk)
+    conn.executemany('INSERT INTO similar_products VALUES (?, ?, ?, ?)', _neighbour_rows(touched, index, models, k))
+    conn.execute('DELETE FROM similarity_dirty WHERE rowid <= ?', (mark,))
+    conn.commit()
+    return {'products': len(dirty), 'models': len(touched), 'recomputed': len(recompute),
+            'seconds': time.perf_counter() - started}
+
+
+def _variant_order(row):
+    # By storage size (64GB before 1TB; ORDER BY p.storage compares text), then cheapest first
+    storage, price = row[3], row[4]
+    gb = storage_gb(storage)
+    return (gb is None, gb or 0, price is None, price or 0)
+
+
+def variants(conn, product_id):
+    """Other colors/storage of the same model: smallest storage first, then cheapest."""
+    rows = conn.execute('''
+        SELECT p.id, p.name, p.color, p.storage, MIN(pr.price) AS price
+        FROM product_models m
+        JOIN product_models v ON v.model_key = m.model_key AND v.product_id != m.product_id
+        JOIN products p ON p.id = v.product_id
+        LEFT JOIN prices pr ON pr.product_id = p.id
+        WHERE m.product_id = ?
+        GROUP BY p.id
+    ''', (product_id,)).fetchall()
+    return sorted(rows, key=_variant_order)
+
+
+def alternatives(conn, product_id):
+    """Precomputed similar products of other models, best first."""
+    return conn.execute('''
+        SELECT p.id, p.name, p.color, p.storage, s.score,
+               (SELECT MIN(price) FROM prices WHERE product_id = p.id) AS price
+        FROM similar_products s
+        JOIN products p ON p.id = s.similar_id
+        WHERE s.product_id = ?
+        ORDER BY s.rank
+    ''', (product_id,)).fetchall()
@@ -0,0 +1,16 @@
+import os
+import shutil
+import tempfile
+
+# app.py migrates its database on import: give the test session a scratch
+# copy instead of the committed kazprice.db. Set before any test imports app.
+_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SCRATCH = tempfile.mkdtemp(prefix='kazprice-tests-')
+shutil.copy(os.path.join(_REPO, 'kazprice.db'), os.path.join(_SCRATCH, 'kazprice.db'))
+os.environ['KAZPRICE_DB'] = os.path.join(_SCRATCH, 'kazprice.db')
+os.environ['KAZPRICE_JINJA_CACHE'] = os.path.join(_SCRATCH, 'jinja_cache')
+os.environ['KAZPRICE_CATALOG_SNAPSHOT'] = os.path.join(_SCRATCH, 'catalog.snap')
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_SCRATCH, ignore_errors=True)
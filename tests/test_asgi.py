@@ -0,0 +1,38 @@
+import asyncio
+
+from asgi import FlaskASGI, _build_environ
+from app import app
+
+
+def _call(asgi_app, method, path, body=b'', headers=()):
+    sent = []
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'',
+             'headers': list(headers), 'server': ('testserver', 80), 'client': ('127.0.0.1', 5000)}
+    asyncio.run(asgi_app(scope, receive, send))
+    return sent
+
+
+def test_asgi_serves_flask_routes():
+    sent = _call(FlaskASGI(app), 'GET', '/')
+    assert sent[0]['type'] == 'http.response.start'
+    assert sent[0]['status'] == 302
+    assert (b'location', b'/login') in sent[0]['headers']
+    assert sent[-1] == {'type': 'http.response.body', 'body': b''}
+
+
+def test_write_endpoints_go_to_single_writer():
+    asgi_app = FlaskASGI(app)
+    executors = asgi_app._executors()
+    post = _build_environ({'method': 'POST', 'path': '/process_payment', 'headers': []}, b'')
+    get = _build_environ({'method': 'GET', 'path': '/main', 'headers': []}, b'')
+    assert executors.for_request(app, post) is executors.writer
+    assert executors.for_request(app, get) is executors.readers
+    executors.shutdown()
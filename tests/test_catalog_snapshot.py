@@ -0,0 +1,53 @@
+import os
+import sqlite3
+
+from catalog_snapshot import CatalogSnapshot, SnapshotReader, build_snapshot, write_snapshot
+
+
+def _make_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, color TEXT, storage TEXT, image_url TEXT);
+        CREATE TABLE prices (id INTEGER PRIMARY KEY, product_id INTEGER, store_id INTEGER, price INTEGER);
+        CREATE TABLE catalog_meta (id INTEGER PRIMARY KEY, version INTEGER);
+        INSERT INTO catalog_meta VALUES (1, 7);
+        INSERT INTO products VALUES (1, 'Apple iPhone 17 Pro Max', 'Оранжевый', '256GB', 'iphone17or.jpeg');
+        INSERT INTO products VALUES (2, 'Apple iPhone 17 Pro Max', 'Темно-синий', '256GB', NULL);
+        INSERT INTO products VALUES (5, 'Galaxy', '', NULL, NULL);
+        INSERT INTO prices (product_id, store_id, price) VALUES (1, 1, 925990), (2, 3, 957990), (2, 2, 934990);
+    ''')
+    conn.commit()
+    return conn
+
+
+def test_build_and_lookup(tmp_path):
+    conn = _make_db(str(tmp_path / 'kazprice.db'))
+    out = str(tmp_path / 'catalog.snap')
+    assert build_snapshot(conn, out) == (3, 7)
+
+    snap = CatalogSnapshot(out)
+    assert len(snap) == 3 and snap.catalog_version == 7
+    assert snap.get(2) == {'id': 2, 'name': 'Apple iPhone 17 Pro Max', 'color': 'Темно-синий',
+                           'storage': '256GB', 'image_url': None, 'price': 934990, 'store_id': 2}
+    # Sparse ids fall back to binary search; '' and NULL stay distinct
+    assert snap.get(5)['color'] == '' and snap.get(5)['storage'] is None
+    assert snap.price(5) is None and snap.get(5)['store_id'] is None
+    assert snap.get(3) is None and snap.get(99) is None and snap.price(0) is None
+    assert [p['id'] for p in snap.products([5, 1, 1, 42])] == [1, 5]
+
+
+def test_reader_picks_up_replaced_file(tmp_path):
+    out = str(tmp_path / 'catalog.snap')
+    reader = SnapshotReader(out)
+    assert reader.current() is None
+
+    write_snapshot([(1, 'a', None, None, None, 100, 1)], out, catalog_version=1)
+    first = reader.current()
+    assert first.price(1) == 100
+    assert reader.current() is first
+
+    write_snapshot([(1, 'a', None, None, None, 90, 2), (2, 'b', None, None, None, 50, 1)], out, catalog_version=2)
+    second = reader.current()
+    assert second is not first and second.catalog_version == 2 and second.price(1) == 90
+    assert first.price(1) == 100  # old mapping stays valid for requests still using it
+    assert not [n for n in os.listdir(tmp_path) if '.tmp.' in n]
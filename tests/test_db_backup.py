@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+import db_backup
+
+
+def _make_db(path, rows=500, wal=True, note=''):
+    conn = sqlite3.connect(path)
+    if wal:
+        conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE prices (id INTEGER PRIMARY KEY, product_id INTEGER, price INTEGER, note TEXT)')
+    conn.executemany('INSERT INTO prices (product_id, price, note) VALUES (?, ?, ?)',
+                     [(i % 7, i * 10, note) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def _count(path):
+    conn = sqlite3.connect(path)
+    n = conn.execute('SELECT COUNT(*) FROM prices').fetchone()[0]
+    conn.close()
+    return n
+
+
+def test_backup_verify_restore(tmp_path):
+    db = str(tmp_path / 'kazprice.db')
+    _make_db(db)
+
+    plain = db_backup.make_backup(db, str(tmp_path / 'backups'), pages=1, step_sleep=0)
+    gz = db_backup.make_backup(db, str(tmp_path / 'gz'), compact=True, compress=True)
+    assert gz.endswith('.gz')
+    assert db_backup.integrity_check(plain) == []
+    assert db_backup.integrity_check(gz) == []
+    assert _count(plain) == 500
+
+    conn = sqlite3.connect(db)
+    conn.execute('DELETE FROM prices')
+    conn.commit()
+    conn.close()
+
+    db_backup.restore_backup(gz, db)
+    assert _count(db) == 500
+
+
+def test_backup_refuses_rollback_journal(tmp_path):
+    db = str(tmp_path / 'kazprice.db')
+    _make_db(db, wal=False)
+    with pytest.raises(db_backup.JournalModeError):
+        db_backup.make_backup(db, str(tmp_path / 'backups'))
+    assert db_backup.list_backups(db, str(tmp_path / 'backups')) == []
+
+    assert db_backup.enable_wal(db) == 'wal'
+    assert _count(db_backup.make_backup(db, str(tmp_path / 'backups'))) == 500
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_backup_with_concurrent_writer(tmp_path, compact):
+    db = str(tmp_path / 'kazprice.db')
+    _make_db(db, rows=4000, note='x' * 200)
+    stop = threading.Event()
+    commits, waits, errors = [], [], []
+
+    def writer():
+        conn = sqlite3.connect(db, timeout=5)
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                conn.execute('INSERT INTO prices (product_id, price) VALUES (1, 1)')
+                conn.commit()
+                waits.append(time.perf_counter() - started)
+                commits.append(time.perf_counter())
+                time.sleep(0.001)
+        except sqlite3.Error as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    t = threading.Thread(target=writer)
+    t.start()
+    try:
+        while not commits:
+            time.sleep(0.001)
+        started = time.perf_counter()
+        dest = db_backup.make_backup(db, str(tmp_path / 'backups'), compact=compact, pages=4, step_sleep=0.002)
+        finished = time.perf_counter()
+        time.sleep(0.02)
+    finally:
+        stop.set()
+        t.join()
+
+    assert errors == []
+    # The writer kept committing while the copy ran, without waiting on it
+    assert any(started <= c <= finished for c in commits)
+    assert max(waits) < 1.0
+    assert db_backup.integrity_check(dest) == []
+    assert 4000 <= _count(dest) < _count(db)
+
+
+def test_verify_rejects_garbage(tmp_path):
+    bad = tmp_path / 'kazprice.db.bak.20250101_000000'
+    bad.write_bytes(b'not a database' * 100)
+    assert db_backup.integrity_check(str(bad)) != []
+
+
+def test_prune_keeps_newest(tmp_path):
+    db = str(tmp_path / 'kazprice.db')
+    _make_db(db, rows=1)
+    for i, ts in enumerate(['20250101_000000', '20250102_000000', '20250103_000000']):
+        path = tmp_path / ('kazprice.db.bak.' + ts)
+        path.write_bytes(b'x')
+        os.utime(path, (1000 + i, 1000 + i))
+
+    removed = db_backup.prune_backups(db, keep=2)
+    assert [os.path.basename(p) for p in removed] == ['kazprice.db.bak.20250101_000000']
+
+    # Everything is "too old" but the newest backup is never removed
+    removed = db_backup.prune_backups(db, max_age_days=1, now=10 ** 9)
+    assert [os.path.basename(p) for p in db_backup.list_backups(db)] == ['kazprice.db.bak.20250103_000000']
@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+
+import facets
+from facets import FacetIndex, price_bucket
+
+PRODUCTS = [
+    (1, 'Оранжевый', '256GB', 925990),
+    (2, 'Темно-синий', '256GB', 934990),
+    (3, 'Темно-синий', '512GB', 1099990),
+    (4, 'Black', '128GB', None),
+]
+STORES = [(1, 1), (2, 2), (2, 3), (3, 3)]
+
+
+def test_price_bucket():
+    assert price_bucket(925990) == '800000-1000000'
+    assert price_bucket(1099990) == '1000000+'
+    assert price_bucket(None) is None
+
+
+def test_search_filters_and_counts():
+    index = FacetIndex(PRODUCTS, STORES, {1: 'Kaspi.kz', 2: 'iSpace Apple', 3: 'Sulpak'})
+    ids, counts = index.search({})
+    assert ids == [1, 2, 3, 4]
+    assert counts['store'] == {'1': 1, '2': 1, '3': 2}
+
+    ids, counts = index.search({'color': ['Темно-синий'], 'store': ['3']})
+    assert ids == [2, 3]
+    # A facet's own selection does not narrow its counts
+    assert counts['color'] == {'Оранжевый': 0, 'Темно-синий': 2, 'Black': 0}
+    assert counts['store'] == {'1': 0, '2': 1, '3': 2}
+    assert counts['storage'] == {'256GB': 1, '512GB': 1, '128GB': 0}
+
+    # OR inside a facet, AND across facets
+    ids, _ = index.search({'storage': ['256GB', '128GB'], 'price': ['800000-1000000']})
+    assert ids == [1, 2]
+    assert index.search({'color': ['Red']})[0] == []
+    assert index.labels['store']['2'] == 'iSpace Apple'
+    assert index.values('storage') == ['128GB', '256GB', '512GB']
+
+
+def test_stale_index_served_during_background_rebuild(tmp_path):
+    db = str(tmp_path / 'catalog.db')
+    conn = sqlite3.connect(db)
+    conn.executescript('''
+        CREATE TABLE products (id INTEGER PRIMARY KEY, color TEXT, storage TEXT);
+        CREATE TABLE prices (product_id INTEGER, store_id INTEGER, price INTEGER);
+        CREATE TABLE stores (id INTEGER PRIMARY KEY, name TEXT);
+        INSERT INTO products VALUES (1, 'Black', '128GB');
+    ''')
+    conn.commit()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_connect():
+        started.set()
+        release.wait(5)
+        return sqlite3.connect(db)
+
+    facets._index = None
+    try:
+        v1 = facets.get_facet_index(conn, 1, connect=slow_connect)
+        assert len(v1) == 1 and not started.is_set()
+
+        conn.execute("INSERT INTO products VALUES (2, 'White', '256GB')")
+        conn.commit()
+        # Returns the old index at once; one rebuild runs however many requests ask
+        assert facets.get_facet_index(conn, 2, connect=slow_connect) is v1
+        assert facets.get_facet_index(conn, 2, connect=slow_connect) is v1
+        assert started.wait(5)
+        assert sum(t.name == 'facet-index-rebuild' for t in threading.enumerate()) == 1
+
+        release.set()
+        for t in threading.enumerate():
+            if t.name == 'facet-index-rebuild':
+                t.join(5)
+        v2 = facets.get_facet_index(conn, 2, connect=slow_connect)
+        assert v2.version == 2 and len(v2) == 2
+    finally:
+        release.set()
+        facets._index = None
+        conn.close()
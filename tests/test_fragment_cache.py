@@ -0,0 +1,25 @@
+from jinja2 import Environment
+
+from fragment_cache import FragmentCacheExtension
+
+
+def test_cache_tag_reuses_fragment_until_key_changes():
+    env = Environment(extensions=[FragmentCacheExtension], autoescape=True)
+    calls = []
+    env.globals['render_count'] = lambda: calls.append(1) or len(calls)
+    tpl = env.from_string(
+        "{% for p in products %}"
+        "{% cache 'card', p.id, version %}<b>{{ p.name }}#{{ render_count() }}</b>{% endcache %}"
+        "{{ '*' if p.id in favorites }}"
+        "{% endfor %}"
+    )
+    products = [{'id': 1, 'name': 'iPhone <17>'}, {'id': 2, 'name': 'Galaxy'}]
+
+    first = tpl.render(products=products, version=1, favorites=[1])
+    assert first == '<b>iPhone &lt;17&gt;#1</b>*<b>Galaxy#2</b>'
+    # Same key: served from cache, per-user bits still rendered per call
+    assert tpl.render(products=products, version=1, favorites=[2]) == '<b>iPhone &lt;17&gt;#1</b><b>Galaxy#2</b>*'
+    assert len(calls) == 2
+    # Catalog version bump re-renders
+    assert tpl.render(products=products, version=2, favorites=[]) == '<b>iPhone &lt;17&gt;#3</b><b>Galaxy#4</b>'
+    assert env.fragment_cache.hits == 2
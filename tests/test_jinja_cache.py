@@ -0,0 +1,80 @@
+import os
+import sys
+import tempfile
+
+import jinja2.bccache
+from flask import Flask, render_template_string
+from jinja2 import DictLoader, Environment
+
+import jinja_cache
+from jinja_cache import SafeFileSystemBytecodeCache
+
+
+def _read_only(monkeypatch, directory):
+    """Make writes into `directory` fail like on a read-only filesystem (chmod does not stop root)."""
+    real = tempfile.NamedTemporaryFile
+
+    def named_temporary_file(*args, **kwargs):
+        if os.path.abspath(kwargs.get('dir', '')) == os.path.abspath(directory):
+            raise OSError(30, 'Read-only file system')
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(jinja2.bccache.tempfile, 'NamedTemporaryFile', named_temporary_file)
+
+
+def _env(bcc):
+    return Environment(loader=DictLoader({'page.html': 'Hello {{ name }}'}), bytecode_cache=bcc)
+
+
+def test_read_only_cache_renders_and_falls_back(tmp_path, monkeypatch):
+    shipped, fallback = str(tmp_path / 'shipped'), str(tmp_path / 'tmp')
+    os.makedirs(shipped)
+    _read_only(monkeypatch, shipped)
+
+    # Nothing written to the read-only dir, the render still works
+    assert _env(SafeFileSystemBytecodeCache(shipped)).get_template('page.html').render(name='A') == 'Hello A'
+    assert os.listdir(shipped) == []
+
+    # With a fallback the compiled template lands there and is loaded next time
+    assert _env(SafeFileSystemBytecodeCache(shipped, fallback)).get_template('page.html').render(name='B') == 'Hello B'
+    assert len(os.listdir(fallback)) == 1
+    env = _env(SafeFileSystemBytecodeCache(shipped, fallback))
+    monkeypatch.setattr(env, '_compile', lambda *a, **kw: (_ for _ in ()).throw(AssertionError('recompiled')))
+    assert env.get_template('page.html').render(name='C') == 'Hello C'
+
+
+def test_init_app_uses_fallback_when_cache_dir_cannot_be_created(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('not a directory')
+    app = Flask(__name__)
+    bcc = jinja_cache.init_app(app, str(blocker / 'cache'), fallback_directory=str(tmp_path / 'tmp'))
+    assert bcc is not None and bcc.directory == str(tmp_path / 'tmp')
+    with app.app_context():
+        assert render_template_string('{{ 1 + 1 }}') == '2'
+    assert jinja_cache.init_app(Flask(__name__), str(blocker / 'cache'), fallback_directory=None) is None
+
+
+def test_cache_keys_do_not_depend_on_install_path():
+    bcc = SafeFileSystemBytecodeCache(tempfile.gettempdir())
+    here = os.path.join(jinja_cache.APP_ROOT, 'templates', 'base.html')
+    assert bcc.get_cache_key('base.html', here) == bcc.get_cache_key('base.html', os.path.join('templates', 'base.html'))
+
+
+def test_committed_cache_matches_templates_and_pinned_python():
+    from app import app
+
+    assert jinja_cache.pinned_python() is not None
+    # Rebuild with `python3 scripts/compile_templates.py --clear` after editing templates
+    assert jinja_cache.stale_templates(app.jinja_env) == []
+
+
+def test_stale_templates_detects_other_python_and_changed_source(tmp_path):
+    templates = {'page.html': 'Hello {{ name }}'}
+    env = Environment(loader=DictLoader(templates), bytecode_cache=SafeFileSystemBytecodeCache(str(tmp_path)))
+    assert jinja_cache.stale_templates(env, str(tmp_path)) == ['page.html']
+    env.get_template('page.html')
+    here = tuple(sys.version_info[:2])
+    assert jinja_cache.stale_templates(env, str(tmp_path), version=here) == []
+    assert jinja_cache.stale_templates(env, str(tmp_path), version=(here[0], here[1] + 1)) == ['page.html']
+    templates['page.html'] = 'Bye {{ name }}'
+    assert jinja_cache.stale_templates(env, str(tmp_path), version=here) == ['page.html']
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import job_handlers
+import jobs
+
+
+def _conn(tmp_path):
+    conn = jobs.connect(str(tmp_path / 'jobs.db'))
+    jobs.ensure_schema(conn)
+    conn.execute('CREATE TABLE seen (value TEXT)')
+    conn.commit()
+    return conn
+
+
+@jobs.handler('test_record')
+def _record(conn, payload):
+    conn.execute('INSERT INTO seen (value) VALUES (?)', (payload['value'],))
+
+
+@jobs.handler('test_broken')
+def _broken(conn, payload):
+    conn.execute("INSERT INTO seen (value) VALUES ('partial')")
+    raise RuntimeError('boom')
+
+
+def test_claim_is_exclusive_and_handler_commits(tmp_path):
+    conn = _conn(tmp_path)
+    jobs.enqueue(conn, 'test_record', {'value': 'a'})
+    conn.commit()
+
+    job = jobs.claim(conn, 'w1')
+    assert job['kind'] == 'test_record' and job['attempts'] == 1
+    assert jobs.claim(conn, 'w2') is None
+
+    assert jobs.run_job(conn, job) == jobs.DONE
+    assert [r[0] for r in conn.execute('SELECT value FROM seen')] == ['a']
+    assert jobs.queue_depth(conn) == {'done': {'test_record': 1}}
+
+
+def test_failures_back_off_then_dead_letter(tmp_path):
+    conn = _conn(tmp_path)
+    job_id = jobs.enqueue(conn, 'test_broken', max_attempts=2)
+    conn.commit()
+
+    assert jobs.run_job(conn, jobs.claim(conn, 'w1')) == jobs.QUEUED
+    # Handler writes were rolled back, retry is scheduled in the future
+    assert conn.execute('SELECT COUNT(*) FROM seen').fetchone()[0] == 0
+    assert jobs.claim(conn, 'w1') is None
+    run_at = conn.execute('SELECT run_at FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+
+    assert jobs.run_job(conn, jobs.claim(conn, 'w1', now=run_at)) == jobs.DEAD
+    row = conn.execute('SELECT status, last_error FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    assert row['status'] == jobs.DEAD and 'boom' in row['last_error']
+
+    assert jobs.retry_dead(conn) == 1
+    assert jobs.queue_depth(conn) == {'queued': {'test_broken': 1}}
+
+
+def test_stale_running_jobs_are_requeued(tmp_path):
+    conn = _conn(tmp_path)
+    jobs.enqueue(conn, 'test_record', {'value': 'b'})
+    conn.commit()
+    now = time.time()
+    assert jobs.claim(conn, 'crashed', now=now) is not None
+    assert jobs.requeue_stale(conn, timeout=60, now=now + 120) == 1
+    assert jobs.work(str(tmp_path / 'jobs.db'), stop_when_empty=True) == 1
+
+
+def test_stale_job_on_last_attempt_is_dead_lettered(tmp_path):
+    conn = _conn(tmp_path)
+    job_id = jobs.enqueue(conn, 'test_record', {'value': 'c'}, max_attempts=1)
+    conn.commit()
+    now = time.time()
+    assert jobs.claim(conn, 'crashed', now=now) is not None
+    assert jobs.requeue_stale(conn, timeout=60, now=now + 120) == 1
+    row = conn.execute('SELECT status, last_error FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    assert row['status'] == jobs.DEAD and 'timed out' in row['last_error']
+    assert jobs.claim(conn, 'w1') is None
+
+
+def test_worker_that_lost_its_job_does_not_commit(tmp_path):
+    conn = _conn(tmp_path)
+    jobs.enqueue(conn, 'test_record', {'value': 'd'})
+    conn.commit()
+    now = time.time()
+    slow = jobs.claim(conn, 'slow', now=now)
+    # The reaper gives the job to another worker while `slow` is still running it
+    jobs.requeue_stale(conn, timeout=60, now=now + 120)
+    fast = jobs.claim(conn, 'fast', now=now + 120)
+
+    assert jobs.run_job(conn, slow) == jobs.LOST
+    assert jobs.fail(conn, slow, 'late error') == jobs.LOST
+    assert conn.execute('SELECT COUNT(*) FROM seen').fetchone()[0] == 0
+    assert jobs.run_job(conn, fast) == jobs.DONE
+    assert [r[0] for r in conn.execute('SELECT value FROM seen')] == ['d']
+
+
+def test_order_paid_handler_is_idempotent(tmp_path):
+    conn = jobs.connect(str(tmp_path / 'orders.db'))
+    job_handlers.ensure_schema(conn)
+    payload = {'order_id': 7, 'items': [{'product_id': 1, 'quantity': 2, 'price': 100},
+                                        {'product_id': 2, 'quantity': 1, 'price': 50}]}
+    job_handlers.record_order_items(conn, payload)
+    job_handlers.record_order_items(conn, payload)
+    assert conn.execute('SELECT COUNT(*) FROM order_items WHERE order_id = 7').fetchone()[0] == 2
+
+
+def test_cli_migrates_the_given_db_only(tmp_path):
+    db = tmp_path / 'data' / 'kazprice.db'
+    db.parent.mkdir()
+    sqlite3.connect(str(db)).close()
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts', 'job_queue.py')
+    env = dict(os.environ)
+    env.pop('KAZPRICE_DB', None)
+    for command in ('status', 'work'):
+        args = [sys.executable, script, command, '--db', str(db)] + (['--once'] if command == 'work' else [])
+        result = subprocess.run(args, cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+    assert not (tmp_path / 'kazprice.db').exists()
+    tables = {r[0] for r in sqlite3.connect(str(db)).execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {'jobs', 'order_items'} <= tables
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+
+import pytest
+
+import app as kazprice
+
+DB_INIT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db_init.sql')
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = str(tmp_path / 'kazprice.db')
+    conn = sqlite3.connect(path)
+    with open(DB_INIT, encoding='utf-8') as f:
+        conn.executescript(f.read())
+    conn.executescript('''
+        INSERT INTO users (id, name, email, password_hash) VALUES (1, 'Aruzhan', 'a@kz', 'h');
+        INSERT INTO users (id, name, email, password_hash) VALUES (2, 'Dias', 'd@kz', 'h');
+        INSERT INTO bank_cards (id, user_id, card_name, card_number, balance) VALUES (11, 1, 'Kaspi Gold', '**** 4300', 10000000);
+        INSERT INTO bank_cards (id, user_id, card_name, card_number, balance) VALUES (12, 1, 'Halyk Bank', '**** 2100', 100);
+        INSERT INTO bank_cards (id, user_id, card_name, card_number, balance) VALUES (13, 2, 'Jusan', '**** 7700', 10000000);
+    ''')
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(kazprice, 'DATABASE', path)
+    kazprice.app.extensions['rate_limit'].reset()
+    monkeypatch.setattr(kazprice, 'user_contexts', kazprice.user_context.UserContextCache())
+
+    c = kazprice.app.test_client()
+    with c.session_transaction() as sess:
+        sess['user_id'] = 1
+        sess['cart'] = {'1': 2}
+    c.db_path = path
+    return c
+
+
+def _balance(path, card_id):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT balance FROM bank_cards WHERE id = ?', (card_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_payment_charges_card_and_records_order(client):
+    r = client.post('/process_payment', json={'card_id': 11})
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body['status'] == 'success'
+    assert _balance(client.db_path, 11) == 10000000 - body['total_paid'] == body['new_balance']
+
+    conn = sqlite3.connect(client.db_path)
+    assert conn.execute('SELECT user_id, total_amount FROM order_history').fetchall() == [(1, body['total_paid'])]
+    assert conn.execute("SELECT kind FROM jobs").fetchall() == [('order_paid',)]
+    conn.close()
+    with client.session_transaction() as sess:
+        assert sess['cart'] == {}
+
+
+def test_payment_with_insufficient_funds(client):
+    r = client.post('/process_payment', json={'card_id': 12})
+    assert r.status_code == 400
+    assert r.get_json()['message'] == 'Қаражатыңыз жеткіліксіз'
+    assert _balance(client.db_path, 12) == 100
+    with client.session_transaction() as sess:
+        assert sess['cart'] == {'1': 2}
+
+
+def test_payment_with_someone_elses_card(client):
+    r = client.post('/process_payment', json={'card_id': 13})
+    assert r.status_code == 404
+    assert r.get_json()['message'] == 'Карта табылмады'
+    assert _balance(client.db_path, 13) == 10000000
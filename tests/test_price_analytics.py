@@ -0,0 +1,47 @@
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import price_analytics
+
+
+def _make_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE stores (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE prices (id INTEGER PRIMARY KEY, product_id INTEGER, store_id INTEGER, price INTEGER);
+        INSERT INTO stores VALUES (1, 'Kaspi.kz'), (2, 'iSpace Apple'), (3, 'Sulpak');
+        INSERT INTO prices (product_id, store_id, price) VALUES
+            (1, 1, 925990), (1, 2, 934990), (1, 3, 9259),
+            (2, 2, 934990), (2, 3, 957990),
+            (3, 1, 500000), (3, 2, 510000), (3, 3, 520000), (3, 1, NULL),
+            (4, 1, 100000);
+    ''')
+    conn.commit()
+    return conn
+
+
+def test_analyze_chunk_flags_feed_error():
+    stats, outliers, _ = price_analytics.analyze_chunk(
+        np.array([1, 1, 1]), np.array([1, 2, 3]), np.array([925990, 934990, 9259]))
+    assert stats['median_price'].tolist() == [925990.0]
+    assert stats['mad'].tolist() == [9000.0]
+    assert outliers['store_id'].tolist() == [3]
+
+
+@pytest.mark.parametrize('chunk_rows', [1, 2, 3, 1000])
+def test_run_writes_summary_tables(tmp_path, chunk_rows):
+    conn = _make_db(str(tmp_path / 'kazprice.db'))
+    report = price_analytics.run(conn, chunk_rows=chunk_rows)
+    assert report['rows'] == 9 and report['products'] == 4 and report['outliers'] == 1
+
+    assert conn.execute('SELECT price_id, store_id, price FROM price_outliers').fetchall() == [(3, 3, 9259)]
+    assert conn.execute('SELECT n_prices, min_price, median_price, max_price FROM product_price_stats '
+                        'WHERE product_id = 3').fetchone() == (3, 500000, 510000.0, 520000)
+    index = dict(conn.execute('SELECT store_id, price_index FROM store_price_index').fetchall())
+    assert index[1] < index[2] < index[3]
+    cheapest = dict(conn.execute('SELECT store_id, cheapest_count FROM store_price_index').fetchall())
+    # The 9 259 ₸ outlier does not make Sulpak the cheapest for product 1
+    assert cheapest == {1: 2, 2: 1, 3: 0}
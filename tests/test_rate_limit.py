@@ -0,0 +1,118 @@
+from flask import Flask
+
+import rate_limit
+from rate_limit import Limit, MemoryBucketStore, SQLiteBucketStore
+
+
+def test_memory_bucket_refills_and_evicts():
+    store = MemoryBucketStore(max_keys=2)
+    assert store.hit('a', rate=1, burst=2, now=0) == (True, 0)
+    assert store.hit('a', rate=1, burst=2, now=0) == (True, 0)
+    allowed, retry_after = store.hit('a', rate=1, burst=2, now=0.25)
+    assert not allowed and abs(retry_after - 0.75) < 1e-9
+    assert store.hit('a', rate=1, burst=2, now=1.25)[0]
+
+    store.hit('b', rate=1, burst=2, now=2)
+    store.hit('c', rate=1, burst=2, now=2)
+    assert len(store) == 2
+    # 'a' was least recently used and got evicted, so it starts with a full bucket
+    assert store.hit('a', rate=1, burst=1, now=2) == (True, 0)
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'rl.db')
+    w1, w2 = SQLiteBucketStore(path), SQLiteBucketStore(path)
+    assert w1.hit('ip:login:1.2.3.4', rate=0.5, burst=2, now=100)[0]
+    assert w2.hit('ip:login:1.2.3.4', rate=0.5, burst=2, now=100)[0]
+    allowed, retry_after = w1.hit('ip:login:1.2.3.4', rate=0.5, burst=2, now=100)
+    assert not allowed and abs(retry_after - 2) < 1e-9
+    assert w2.hit('ip:login:1.2.3.4', rate=0.5, burst=2, now=102)[0]
+
+
+def test_init_app_returns_429_with_retry_after():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/add_to_cart', methods=['POST'])
+    def add_to_cart():
+        return {'status': 'ok'}
+
+    rate_limit.init_app(app, {'add_to_cart': Limit(rate=0.1, burst=2)})
+    c = app.test_client()
+    assert c.post('/add_to_cart', json={}).status_code == 200
+    assert c.post('/add_to_cart', json={}).status_code == 200
+    r = c.post('/add_to_cart', json={})
+    assert r.status_code == 429
+    assert r.headers['Retry-After'] == '10'
+    assert r.get_json()['status'] == 'error'
+
+
+def _limited_app(**kwargs):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+
+    @app.route('/login', methods=['GET', 'POST'])
+    def login():
+        return 'ok'
+
+    rate_limit.init_app(app, {'login': Limit(rate=0.1, burst=1, methods=('POST',))}, **kwargs)
+    return app
+
+
+def test_form_post_gets_flash_and_redirect():
+    c = _limited_app().test_client()
+    assert c.post('/login', data={'email': 'a'}).status_code == 200
+    r = c.post('/login', data={'email': 'a'})
+    assert r.status_code == 303
+    assert r.headers['Location'].endswith('/login')
+    assert r.headers['Retry-After'] == '10'
+    with c.session_transaction() as sess:
+        assert sess['_flashes'][0][0] == 'danger'
+
+
+def test_anonymous_sessions_and_forwarded_ips():
+    app = _limited_app(trusted_proxies=1)
+    # Same client IP, new session: the IP bucket still applies
+    assert app.test_client().post('/login', headers={'X-Forwarded-For': '10.0.0.1'}).status_code == 200
+    assert app.test_client().post('/login', headers={'X-Forwarded-For': '10.0.0.1'}).status_code == 429
+    # Another client behind the same proxy has its own IP bucket
+    assert app.test_client().post('/login', headers={'X-Forwarded-For': '10.0.0.2'}).status_code == 200
+    keys = list(app.extensions['rate_limit']._buckets)
+    assert 'ip:login:10.0.0.2' in keys
+    assert sum(k.startswith('session:login:') for k in keys) == 2
+
+    # Without trusted proxies the header is ignored
+    app = _limited_app()
+    assert app.test_client().post('/login', headers={'X-Forwarded-For': '10.0.0.3'}).status_code == 200
+    assert app.test_client().post('/login', headers={'X-Forwarded-For': '10.0.0.4'}).status_code == 429
+
+
+def test_refused_request_does_not_spend_ip_token():
+    app = _limited_app(trusted_proxies=1)
+    store = app.extensions['rate_limit']
+    # The user's bucket is drained from another address...
+    c = app.test_client()
+    with c.session_transaction() as sess:
+        sess['user_id'] = 7
+    assert c.post('/login', headers={'X-Forwarded-For': '10.0.0.1'}).status_code == 200
+    # ...so a request from a shared (NAT) address is refused by the user bucket
+    assert c.post('/login', headers={'X-Forwarded-For': '10.0.0.9'}).status_code == 429
+    assert store._buckets['ip:login:10.0.0.9'][0] == 1
+    # and the next client behind that address still gets its token
+    assert app.test_client().post('/login', headers={'X-Forwarded-For': '10.0.0.9'}).status_code == 200
+
+
+def test_sqlite_store_refund(tmp_path):
+    store = SQLiteBucketStore(str(tmp_path / 'rl.db'))
+    assert store.hit('k', rate=0.001, burst=1, now=100)[0]
+    store.refund('k', burst=1)
+    assert store.hit('k', rate=0.001, burst=1, now=100)[0]
+    assert not store.hit('k', rate=0.001, burst=1, now=100)[0]
+
+
+def test_reset_refills_every_bucket(tmp_path):
+    for store in (MemoryBucketStore(), SQLiteBucketStore(str(tmp_path / 'rl.db'))):
+        assert store.hit('k', rate=0.001, burst=1, now=100)[0]
+        assert not store.hit('k', rate=0.001, burst=1, now=100)[0]
+        store.reset()
+        assert store.hit('k', rate=0.001, burst=1, now=100)[0]
@@ -0,0 +1,73 @@
+import sqlite3
+
+import similar_products as sp
+
+
+def _make_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, color TEXT, storage TEXT, image_url TEXT);
+        CREATE TABLE prices (id INTEGER PRIMARY KEY, product_id INTEGER, store_id INTEGER, price INTEGER);
+        INSERT INTO products VALUES
+            (1, 'Apple iPhone 17 Pro Max', 'Оранжевый', '256GB', NULL),
+            (2, 'Apple iPhone 17 Pro Max', 'Темно-синий', '256GB', NULL),
+            (3, 'Apple iPhone 17 Pro', 'Черный', '256GB', NULL),
+            (4, 'Apple iPhone 16 Pro Max', 'Белый', '512GB', NULL),
+            (5, 'Samsung Galaxy S25 Ultra', 'Черный', '256GB', NULL);
+        INSERT INTO prices (product_id, store_id, price) VALUES
+            (1, 1, 925990), (2, 2, 934990), (3, 1, 799990), (4, 1, 850000), (5, 1, 700000);
+    ''')
+    sp.ensure_schema(conn)
+    return conn
+
+
+def test_model_key_and_storage():
+    assert sp.model_key('Apple iPhone 17 Pro Max 256GB (Оранжевый)') == 'apple iphone 17 pro max'
+    assert sp.model_key('  APPLE iPhone 17  Pro Max ') == 'apple iphone 17 pro max'
+    assert sp.storage_gb('256GB') == 256 and sp.storage_gb('1 TB') == 1024 and sp.storage_gb('') is None
+
+
+def test_rebuild_variants_and_alternatives(tmp_path):
+    conn = _make_db(str(tmp_path / 'kazprice.db'))
+    report = sp.rebuild(conn)
+    assert report['products'] == 5 and report['models'] == 4
+
+    assert [r[0] for r in sp.variants(conn, 1)] == [2]
+    alternatives = [r[0] for r in sp.alternatives(conn, 1)]
+    assert alternatives[:2] == [3, 4] and 2 not in alternatives
+    # Products of one model share a profile when storage and price band match
+    assert [r[0] for r in sp.alternatives(conn, 2)] == alternatives
+    assert conn.execute('SELECT COUNT(*) FROM similarity_dirty').fetchone()[0] == 0
+
+
+def test_refresh_only_dirty_products(tmp_path):
+    conn = _make_db(str(tmp_path / 'kazprice.db'))
+    sp.rebuild(conn)
+    assert sp.refresh(conn)['products'] == 0
+
+    conn.execute("INSERT INTO products VALUES (6, 'Apple iPhone 17 Pro Max', 'Серебристый', '512GB', NULL)")
+    conn.execute('INSERT INTO prices (product_id, store_id, price) VALUES (6, 1, 1100000)')
+    conn.execute('DELETE FROM prices WHERE product_id = 3')
+    conn.execute('DELETE FROM products WHERE id = 3')
+    conn.commit()
+    report = sp.refresh(conn)
+    assert report['products'] == 2
+
+    assert sorted(r[0] for r in sp.variants(conn, 1)) == [2, 6]
+    assert 3 not in [r[0] for r in sp.alternatives(conn, 1)]
+    assert sp.alternatives(conn, 3) == []
+    assert [r[0] for r in sp.alternatives(conn, 6)][0] == 4
+    assert conn.execute('SELECT COUNT(*) FROM similarity_dirty').fetchone()[0] == 0
+
+
+def test_variants_sorted_by_storage_size(tmp_path):
+    conn = _make_db(str(tmp_path / 'kazprice.db'))
+    conn.row_factory = sqlite3.Row
+    conn.executescript('''
+        INSERT INTO products VALUES
+            (7, 'Apple iPhone 17 Pro Max', 'Белый', '1TB', NULL),
+            (8, 'Apple iPhone 17 Pro Max', 'Белый', '512GB', NULL),
+            (9, 'Apple iPhone 17 Pro Max', 'Белый', '64GB', NULL);
+    ''')
+    sp.rebuild(conn)
+    assert [r['storage'] for r in sp.variants(conn, 1)] == ['64GB', '256GB', '512GB', '1TB']
@@ -0,0 +1,92 @@
+import sqlite3
+
+from flask import Flask, session
+
+import user_context
+from user_context import UserContextCache
+
+
+def _make_db(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript('''
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT UNIQUE, password_hash TEXT,
+                            phone TEXT, address TEXT, created_at TEXT);
+        CREATE TABLE bank_cards (id INTEGER PRIMARY KEY, user_id INTEGER, card_name TEXT, card_number TEXT,
+                                 balance INTEGER, created_at TEXT);
+        INSERT INTO users VALUES (1, 'Aruzhan', 'a@kz', 'h', NULL, 'Алматы', '2025-01-01');
+        INSERT INTO users VALUES (2, 'Dias', 'd@kz', 'h', NULL, NULL, '2025-01-02');
+        INSERT INTO bank_cards VALUES (1, 1, 'Kaspi Gold', '**** 4300', 4300000, '2025-01-01');
+        INSERT INTO bank_cards VALUES (2, 1, 'Halyk Bank', '**** 2100', 2100000, '2025-02-01');
+    ''')
+    return conn
+
+
+def test_fetch_user_and_cards(tmp_path):
+    conn = _make_db(str(tmp_path / 'kazprice.db'))
+    ctx = user_context.fetch(conn, user_id=1)
+    assert ctx.user['name'] == 'Aruzhan' and ctx.user['address'] == 'Алматы'
+    assert [c['card_name'] for c in ctx.cards] == ['Halyk Bank', 'Kaspi Gold']
+    assert user_context.fetch(conn, user_id=2).cards == ()
+    assert user_context.fetch(conn, email='a@kz', password_hash='h').user['id'] == 1
+    assert user_context.fetch(conn, email='a@kz', password_hash='wrong') is None
+    assert user_context.fetch(conn, user_id=99) is None
+
+
+def test_cache_ttl_version_and_lru():
+    cache = UserContextCache(ttl=10, maxsize=2)
+    cache.put(1, 0, 'ctx1', now=100)
+    assert cache.get(1, 0, now=105) == 'ctx1'
+    assert cache.get(1, 1, now=105) is None      # session version bumped elsewhere
+    assert cache.get(1, 0, now=110) is None      # expired
+    cache.put(1, 0, 'ctx1', now=200)
+    cache.put(2, 0, 'ctx2', now=200)
+    cache.get(1, 0, now=201)
+    cache.put(3, 0, 'ctx3', now=201)             # evicts 2, the least recently used
+    assert cache.get(2, 0, now=201) is None and cache.get(1, 0, now=201) == 'ctx1'
+    cache.invalidate(1)
+    assert cache.get(1, 0, now=201) is None
+    assert cache.hits == 3 and len(cache) == 1
+
+    disabled = UserContextCache(ttl=0)
+    disabled.put(1, 0, 'ctx1')
+    assert len(disabled) == 0
+
+
+def test_current_loads_once_and_changed_invalidates(tmp_path):
+    path = str(tmp_path / 'kazprice.db')
+    _make_db(path).close()
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    cache = UserContextCache(ttl=30)
+    opened = []
+
+    def connect():
+        opened.append(1)
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @app.route('/me')
+    def me():
+        ctx = user_context.current(cache, connect)
+        user_context.current(cache, connect)
+        return str(len(ctx.cards)) if ctx else 'anonymous'
+
+    @app.route('/add_card')
+    def add_card():
+        conn = connect()
+        conn.execute("INSERT INTO bank_cards VALUES (3, 1, 'Jusan', '**** 1111', 0, '2025-03-01')")
+        conn.commit()
+        conn.close()
+        user_context.changed(cache, session['user_id'])
+        return 'ok'
+
+    with app.test_client() as c:
+        assert c.get('/me').data == b'anonymous'
+        with c.session_transaction() as sess:
+            sess['user_id'] = 1
+        assert c.get('/me').data == b'2' and len(opened) == 1
+        assert c.get('/me').data == b'2' and len(opened) == 1    # served from the cache
+        c.get('/add_card')
+        assert c.get('/me').data == b'3' and len(opened) == 3
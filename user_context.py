@@ -0,0 +1,131 @@
+"""
+The logged-in user and their bank cards, loaded once and reused.
+
+    ctx = user_context.current(cache, get_db_connection)   # ctx.user, ctx.cards
+    user_context.changed(cache, user_id)                    # after writing users/bank_cards
+
+- fetch() reads the user and all their cards with one LEFT JOIN.
+- current() keeps the result on flask.g, so a request never loads it twice,
+  and in a process-wide UserContextCache for `ttl` seconds.
+- Cache entries are tagged with a per-user version kept in the session
+  cookie. changed() bumps that version, so after edit_profile/add_card/
+  process_payment every worker misses its cached entry on the user's next
+  request, not only the worker that handled the write.
+
+Treat ctx.user and ctx.cards as read-only; they are shared between requests.
+Money checks must not trust the cached balance (see process_payment).
+"""
+
+from collections import OrderedDict, namedtuple
+import threading
+import time
+
+from flask import g, session
+
+UserContext = namedtuple('UserContext', 'user cards')
+
+SESSION_KEY = 'user_ctx_version'
+
+_CONTEXT_SQL = '''
+    SELECT u.id, u.name, u.email, u.phone, u.address, u.created_at,
+           c.id AS card_id, c.card_name, c.card_number, c.balance, c.created_at AS card_created_at
+    FROM users u
+    LEFT JOIN bank_cards c ON c.user_id = u.id
+    WHERE {where}
+    ORDER BY c.created_at DESC
+'''
+
+
+def fetch(conn, user_id=None, email=None, password_hash=None):
+    """UserContext by id, or by email and password hash (login); None if no such user."""
+    if user_id is not None:
+        rows = conn.execute(_CONTEXT_SQL.format(where='u.id = ?'), (user_id,)).fetchall()
+    else:
+        rows = conn.execute(_CONTEXT_SQL.format(where='u.email = ? AND u.password_hash = ?'),
+                            (email, password_hash)).fetchall()
+    if not rows:
+        return None
+    first = rows[0]
+    user = {k: first[k] for k in ('id', 'name', 'email', 'phone', 'address', 'created_at')}
+    cards = tuple({'id': r['card_id'], 'card_name': r['card_name'], 'card_number': r['card_number'],
+                   'balance': r['balance'], 'created_at': r['card_created_at']}
+                  for r in rows if r['card_id'] is not None)
+    return UserContext(user, cards)
+
+
+class UserContextCache:
+    """In-process {user_id: (version, expires, UserContext)}, bounded to `maxsize` users (LRU)."""
+
+    def __init__(self, ttl=30.0, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id, version=0, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] != version or entry[1] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, user_id, version, ctx, now=None):
+        if self.ttl <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._entries[user_id] = (version, now + self.ttl, ctx)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def current(cache, connect):
+    """UserContext of session['user_id'] (None when logged out or the user is gone).
+
+    `connect` opens a DB connection; it is only called on a cache miss.
+    """
+    if '_user_context' in g:
+        return g._user_context
+    ctx = None
+    user_id = session.get('user_id')
+    if user_id is not None:
+        version = session.get(SESSION_KEY, 0)
+        ctx = cache.get(user_id, version)
+        if ctx is None:
+            conn = connect()
+            try:
+                ctx = fetch(conn, user_id=user_id)
+            finally:
+                conn.close()
+            if ctx is not None:
+                cache.put(user_id, version, ctx)
+    g._user_context = ctx
+    return ctx
+
+
+def remember(cache, ctx):
+    """Cache a context loaded at login; starts a new version so no older entry can match."""
+    session[SESSION_KEY] = time.time_ns()
+    g._user_context = ctx
+    cache.put(ctx.user['id'], session[SESSION_KEY], ctx)
+
+
+def changed(cache, user_id):
+    """Drop the cached context after a write to the user's users/bank_cards rows."""
+    cache.invalidate(user_id)
+    g.pop('_user_context', None)
+    if session.get('user_id') == user_id:
+        session[SESSION_KEY] = session.get(SESSION_KEY, 0) + 1